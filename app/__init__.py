@@ -2,10 +2,14 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from app.logger import configure_logging
+
+# JSON logs written off the request path; LOG_SAMPLE_RATE thins out INFO/DEBUG in big batch runs
+configure_logging(os.getenv('LOG_LEVEL', 'INFO'), float(os.getenv('LOG_SAMPLE_RATE', '1')))
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///site.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy()
@@ -0,0 +1,700 @@
+import asyncio
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+
+import httpx
+
+from app.dashboardMigration import (SPOOL_MAX_SIZE, TENANT_STEPS, SavedObjectBundle, alias_add_action,
+                                    bundle_fingerprints, changed_saved_objects, data_view_payload, export_payload,
+                                    find_data_view_id, multipart_ndjson, rewrite_data_view_references, role_payload,
+                                    select_saved_objects, space_payload, step_failed, user_payload)
+from app.metrics import current_operation, instrumented, observe_request
+from app.resilience import FAILURE_STATUSES, IDEMPOTENT_METHODS, CircuitBreaker, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Onboarding steps onboard_tenants runs, in rounds: every tenant's requests of a round are in flight together
+ASYNC_TENANT_ROUNDS = (("create_space", "create_role"), ("create_user", "create_data_view"))
+ASYNC_TENANT_STEPS = ("create_index_alias",) + tuple(name for names in ASYNC_TENANT_ROUNDS for name in names)
+
+async def _iterate(parts):
+    # httpx.AsyncClient only streams async iterables
+    for part in parts:
+        yield part
+
+class AsyncElasticAutomation:
+    """
+    asyncio counterpart of ElasticAutomation
+
+    All calls share one httpx.AsyncClient connection pool, and a semaphore
+    bounds how many requests are in flight at once, so a single event loop
+    can drive many tenants in parallel.
+
+    It covers tenant provisioning (aliases, spaces, roles, users, data
+    views), dashboard export and import and the get_* inventory calls, with
+    the same rules as the sync engine: exports are spooled to disk past
+    SPOOL_MAX_SIZE, data view lookups are cached for data_view_cache_ttl
+    seconds, imports leave out objects identical to their copies in the
+    target space, and requests and calls are recorded in app.metrics.
+    Migrations, reconcile and teardown only exist on ElasticAutomation.
+    """
+    def __init__(self, elastic_host, elastic_port, kibana_host, kibana_port, username, password,
+                 verify_ssl=True, ca_cert_path=None, max_connections=100, max_concurrency=50, timeout=30,
+                 retries=3, backoff=0.5, max_backoff=30, failure_threshold=5, reset_timeout=30, scheme="https",
+                 data_view_cache_ttl=300):
+        self.elastic_base_url = f"{scheme}://{elastic_host}:{elastic_port}"
+        self.kibana_base_url = f"{scheme}://{kibana_host}:{kibana_port}"
+        self.auth = (username, password)
+        self.headers = {'Content-Type': 'application/json', 'kbn-xsrf': 'true'}
+        self.verify_ssl = ca_cert_path if ca_cert_path else verify_ssl
+
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_policy = RetryPolicy(retries=retries, backoff=backoff, max_backoff=max_backoff)
+        self._breakers = {
+            base_url: CircuitBreaker(base_url, failure_threshold, reset_timeout)
+            for base_url in (self.elastic_base_url, self.kibana_base_url)
+        }
+        self.data_view_cache_ttl = data_view_cache_ttl
+        self._data_view_cache = {}
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    @staticmethod
+    def from_config(config):
+        return AsyncElasticAutomation(
+            config.get('es_url'),
+            config.get('es_port', 9200),
+            config.get('kb_url'),
+            config.get('kb_port', 5601),
+            config.get('es_user', 'elastic'),
+            config.get('es_pass', ''),
+            config.get('verify_ssl', False),
+            config.get('ca_cert_path', None),
+            max_connections=config.get('max_connections', 100),
+            max_concurrency=config.get('max_concurrency', 50),
+            retries=config.get('retries', 3),
+            scheme=config.get('scheme', 'https')
+        )
+
+    @staticmethod
+    def from_configuration(config, scheme="https"):
+        """
+        Build a client from a stored Configuration row
+
+        Args:
+            config (Configuration): Configuration to connect with
+            scheme (str): http or https
+        """
+        return AsyncElasticAutomation(
+            config.es_url,
+            config.es_port,
+            config.kb_url,
+            config.kb_port,
+            config.es_user,
+            config.es_pass,
+            verify_ssl=False,
+            scheme=scheme
+        )
+
+    async def _request(self, method, url, stream=False, **kwargs):
+        """
+        Send a request with the same retry and circuit breaker rules as ElasticAutomation._request
+
+        A callable content argument is a body factory called once per
+        attempt, so streamed bodies can be sent again; any other async
+        iterator is sent only once. With stream, the body is not read and the
+        caller closes the response.
+        """
+        content = kwargs.pop('content', None)
+        replayable = content is None or callable(content) or isinstance(content, (bytes, str))
+
+        # The client and semaphore bind to the running loop, so they are created on first use
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(auth=self.auth, verify=self.verify_ssl, limits=limits,
+                                             timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        breaker = self._breakers[self.elastic_base_url if url.startswith(self.elastic_base_url) else self.kibana_base_url]
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            breaker.before_call()
+            request = self._client.build_request(method, url, content=content() if callable(content) else content,
+                                                 **kwargs)
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    response = await self._client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                observe_request(url, method, type(e).__name__, time.perf_counter() - started)
+                breaker.record_failure()
+                # Only a request that never reached the server is safe to send again
+                # whatever its method
+                resendable = (method.upper() in IDEMPOTENT_METHODS
+                              or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)))
+                if not (replayable and resendable) or attempt >= policy.retries:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                observe_request(url, method, response.status_code, time.perf_counter() - started)
+                if response.status_code in FAILURE_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if response.status_code not in policy.statuses or not replayable or attempt >= policy.retries:
+                    return response
+                delay = policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                await response.aclose()
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        """
+        Close the connection pool
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    def log(self, message, level=logging.INFO, **fields):
+        """
+        Log a structured record tagged with the running operation, as ElasticAutomation.log does
+        """
+        if logger.isEnabledFor(level):
+            logger.log(level, message, extra={"fields": {"operation": current_operation(), **fields}})
+
+    @staticmethod
+    def _result(response, message):
+        if response.status_code == 200:
+            return {"status": "success", "message": message}
+        return {"status": "error", "message": response.text}
+
+    @instrumented
+    async def create_index_alias(self, index_pattern, alias_name, client_id):
+        """
+        Create an index alias with client_id filter
+
+        Args:
+            index_pattern (str): Index pattern to apply the alias
+            alias_name (str): Alias name to create
+            client_id (str): Client ID to filter the index pattern
+        """
+        if client_id is None:
+            raise ValueError("client_id is required to create an alias")
+
+        url = f"{self.elastic_base_url}/_aliases"
+        payload = {"actions": [alias_add_action(index_pattern, alias_name, client_id)]}
+        response = await self._request('POST', url, json=payload)
+        return self._result(response, "Alias created successfully")
+
+    @instrumented
+    async def create_index_aliases(self, index_pattern, aliases, chunk_size=500):
+        """
+        Create many client_id filtered aliases with one atomic _aliases request per chunk
+
+        Args:
+            index_pattern (str): Index pattern to apply the aliases
+            aliases (dict): Alias name to create, keyed by client ID
+            chunk_size (int): Maximum number of add actions per request
+
+        Returns:
+            list: One result per alias, in the order given
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        items = list(aliases.items())
+        if any(client_id is None for client_id, _ in items):
+            raise ValueError("client_id is required to create an alias")
+
+        url = f"{self.elastic_base_url}/_aliases"
+
+        async def send(chunk):
+            payload = {"actions": [alias_add_action(index_pattern, alias_name, client_id) for client_id, alias_name in chunk]}
+            result = self._result(await self._request('POST', url, json=payload), "Alias created successfully")
+            return [{"client_id": client_id, "alias": alias_name, **result} for client_id, alias_name in chunk]
+
+        chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+        results = await asyncio.gather(*(send(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+    @instrumented
+    async def create_space(self, space_id, name, description=""):
+        """
+        Create a Kibana space
+
+        Args:
+            space_id (str): ID of the space to create
+            name (str): Name of the space
+            description (str): Description of the space
+        """
+        url = f"{self.kibana_base_url}/api/spaces/space"
+        response = await self._request('POST', url, json=space_payload(space_id, name, description), headers=self.headers)
+        return self._result(response, "Space created successfully")
+
+    @instrumented
+    async def create_role(self, role_name, indice, space):
+        """
+        Create a role with specified index privileges
+
+        Args:
+            role_name (str): Role name to create
+            indice (str): Index pattern to apply the role
+            space (str): Space name to apply the role
+        """
+        url = f"{self.elastic_base_url}/_security/role/{role_name}"
+        response = await self._request('PUT', url, json=role_payload(indice, space), headers=self.headers)
+        return self._result(response, "Role created successfully")
+
+    @instrumented
+    async def create_user(self, username, password, roles):
+        """
+        Create a user and assign roles
+
+        Args:
+            username (str): Username to create
+            password (str): Password for the user
+            roles (list): List of roles to assign
+        """
+        url = f"{self.elastic_base_url}/_security/user/{username}"
+        response = await self._request('PUT', url, json=user_payload(username, password, roles), headers=self.headers)
+        return self._result(response, "User created successfully")
+
+    @instrumented
+    async def create_data_view(self, space_id, dataview_name, index_pattern):
+        """
+        Create a data view in Kibana
+
+        Args:
+            space_id (str): ID of the space to create the data view
+            dataview_name (str): Name of the data view
+            index_pattern (str): Index pattern to associate with the data view
+        """
+        url = f"{self.kibana_base_url}/s/{space_id}/api/data_views/data_view"
+        response = await self._request('POST', url, json=data_view_payload(dataview_name, index_pattern), headers=self.headers)
+        if response.status_code == 200:
+            data_view_id = response.json().get('data_view', {}).get('id')
+            entry = self._data_view_cache.get(space_id)
+            if data_view_id and entry is not None:
+                entry[1].setdefault(dataview_name, data_view_id)
+            elif not data_view_id:
+                self.invalidate_data_view_cache(space_id)
+        return self._result(response, "Data View created successfully")
+
+    @instrumented
+    async def export_saved_objects(self, payload, source_space_id='default', spool_max_size=SPOOL_MAX_SIZE):
+        """
+        Stream a saved objects export line by line into a SavedObjectBundle
+
+        Args:
+            payload (dict): Body of the _export request
+            source_space_id (str): Space to export from
+            spool_max_size (int): Bytes kept in memory before spooling to disk
+
+        Returns:
+            SavedObjectBundle: The exported NDJSON, owned by the caller
+        """
+        url = f"{self.kibana_base_url}/s/{source_space_id}/api/saved_objects/_export"
+        response = await self._request('POST', url, json=payload, headers=self.headers, stream=True)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(f"Export failed: {response.text}")
+
+            bundle = SavedObjectBundle(max_size=spool_max_size)
+            try:
+                async for line in response.aiter_lines():
+                    bundle.append(line.encode('utf-8'))
+            except Exception:
+                bundle.close()
+                raise
+            return bundle
+        finally:
+            await response.aclose()
+
+    @instrumented
+    async def export_dashboard_bundle(self, dashboard_id, source_space_id='default', spool_max_size=SPOOL_MAX_SIZE):
+        """
+        Export a dashboard and its references without holding the whole response in memory
+
+        Returns:
+            SavedObjectBundle: The exported NDJSON, owned by the caller
+        """
+        self.log(f"Exporting dashboard {dashboard_id} from space {source_space_id}", space=source_space_id)
+        return await self.export_saved_objects(export_payload(dashboard_id), source_space_id, spool_max_size)
+
+    @instrumented
+    async def export_dashboard(self, dashboard_id, source_space_id='default'):
+        """
+        Export a dashboard from a specific space
+
+        Args:
+            dashboard_id (str): ID of the dashboard to export
+            source_space_id (str): Space to export from
+
+        Returns:
+            bytes: The exported NDJSON, or an error dict
+        """
+        self.log(f"Exporting dashboard {dashboard_id} from space {source_space_id}", space=source_space_id)
+
+        url = f"{self.kibana_base_url}/s/{source_space_id}/api/saved_objects/_export"
+        response = await self._request('POST', url, json=export_payload(dashboard_id), headers=self.headers)
+        if response.status_code == 200:
+            return response.content
+        return {"status": "error", "message": response.text}
+
+    @instrumented
+    async def import_saved_objects(self, lines, target_space_id, overwrite=True):
+        """
+        Import NDJSON lines into a space with a streamed multipart body
+
+        Args:
+            lines (iterable|callable): NDJSON lines to upload, or a function
+                returning a fresh iterable of them so a failed upload can be resent
+            target_space_id (str): Space to import into
+            overwrite (bool): Overwrite objects that already exist
+
+        Returns:
+            dict: The _import response
+        """
+        url = f"{self.kibana_base_url}/s/{target_space_id}/api/saved_objects/_import"
+        params = {"overwrite": "true" if overwrite else "false", "createNewCopies": "false"}
+
+        boundary = uuid.uuid4().hex
+        headers = {'kbn-xsrf': 'true', 'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+        if callable(lines):
+            content = lambda: _iterate(multipart_ndjson(lines(), boundary))
+        else:
+            content = _iterate(multipart_ndjson(lines, boundary))
+
+        response = await self._request('POST', url, content=content, params=params, headers=headers)
+        if response.status_code != 200:
+            raise Exception(f"Import failed: {response.text}")
+
+        import_result = response.json()
+
+        # Data views carried by the bundle are now part of the target space
+        if any(item.get('type') == 'index-pattern' for item in import_result.get('successResults', [])):
+            self.invalidate_data_view_cache(target_space_id)
+        return import_result
+
+    async def find_saved_objects_by_origin(self, space_id, types, per_page=1000):
+        """
+        Read every saved object of the given types in a space, keyed by (type, originId or id)
+
+        See ElasticAutomation.find_saved_objects_by_origin.
+        """
+        types = sorted(set(types))
+        if not types:
+            return {}
+
+        url = f"{self.kibana_base_url}/s/{space_id}/api/saved_objects/_find"
+        found = {}
+        page = 1
+        while True:
+            params = {"type": types, "per_page": per_page, "page": page}
+            response = await self._request('GET', url, params=params, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to read saved objects: {response.text}")
+
+            result = response.json()
+            for saved_object in result.get('saved_objects', []):
+                found[(saved_object['type'], saved_object.get('originId') or saved_object['id'])] = saved_object
+
+            if page * per_page >= result.get('total', 0):
+                return found
+            page += 1
+
+    @instrumented
+    async def import_dashboard(self, export_content, target_space_id, source_data_view, target_data_view,
+                               skip_unchanged=True):
+        """
+        Import a dashboard into a specific space and update its data view
+
+        References to the source data view are rewritten and the source data
+        view itself is left out of the bundle. With skip_unchanged, only the
+        objects that are new or differ from their copies in the target space
+        are uploaded, and nothing at all when the space is up to date.
+
+        Args:
+            export_content (bytes|SavedObjectBundle): The exported dashboard content
+            target_space_id (str): Target space ID
+            source_data_view (str): Original data view ID/name
+            target_data_view (str): New data view ID/name to use
+            skip_unchanged (bool): Leave objects identical to the target ones out of the import
+        """
+        self.log(f"Importing dashboard to space {target_space_id} and updating data view from {source_data_view} to {target_data_view}", space=target_space_id)
+
+        if isinstance(export_content, SavedObjectBundle):
+            bundle = export_content
+        else:
+            bundle = SavedObjectBundle.from_content(export_content)
+
+        try:
+            lines = bundle.lines
+            source_data_view_id = find_data_view_id(bundle.lines(), source_data_view)
+            if source_data_view_id is not None:
+                target_data_view_id = await self.get_data_view_id(target_space_id, target_data_view)
+                lines = lambda: rewrite_data_view_references(bundle.lines(), source_data_view_id, target_data_view_id)
+
+            unchanged = 0
+            if skip_unchanged:
+                try:
+                    fingerprints = bundle_fingerprints(lines())
+                    current = await self.find_saved_objects_by_origin(
+                        target_space_id, {object_type for object_type, _ in fingerprints})
+                    changed = changed_saved_objects(fingerprints, current)
+                except Exception as e:
+                    # Fingerprinting only saves work; without it everything is imported
+                    self.log(f"Importing every object, comparing with space {target_space_id} failed: {e}",
+                             level=logging.WARNING, space=target_space_id)
+                else:
+                    unchanged = len(fingerprints) - len(changed)
+                    if not changed:
+                        self.log(f"Dashboard already up to date in space {target_space_id}", space=target_space_id)
+                        return {"success": True, "successCount": 0, "unchanged": unchanged}
+                    if unchanged:
+                        source_lines = lines
+                        lines = lambda: select_saved_objects(source_lines(), changed)
+
+            import_result = await self.import_saved_objects(lines, target_space_id)
+            import_result["unchanged"] = unchanged
+        finally:
+            if bundle is not export_content:
+                bundle.close()
+
+        if import_result.get('success') is False:
+            raise Exception(f"Import failed: {json.dumps(import_result.get('errors', []))}")
+        return import_result
+
+    @instrumented
+    async def copy_dashboard_between_spaces(self, dashboard_id, source_space_id, target_space_id,
+                                            source_data_view, target_data_view):
+        """
+        Copy a dashboard from one space to another and update its data view
+        """
+        try:
+            with await self.export_dashboard_bundle(dashboard_id, source_space_id) as bundle:
+                return await self.import_dashboard(bundle, target_space_id, source_data_view, target_data_view)
+        except Exception as e:
+            raise Exception(f"Failed to copy dashboard: {str(e)}")
+
+    @instrumented
+    async def get_data_view_id(self, space_id, data_view_name):
+        """
+        Fetch the data view ID for a given name in a specific space
+
+        Lookups are served from a per-space cache filled by a single list call
+        and expired after data_view_cache_ttl seconds. A name missing from a
+        fresh cache triggers one reload, in case it was created elsewhere.
+        """
+        data_view_id = (await self._data_view_ids(space_id)).get(data_view_name)
+        if not data_view_id:
+            data_view_id = (await self._data_view_ids(space_id, refresh=True)).get(data_view_name)
+        if not data_view_id:
+            raise Exception(f"Source data view '{data_view_name}' not found in Kibana.")
+        return data_view_id
+
+    async def _data_view_ids(self, space_id, refresh=False):
+        # Every call runs on the client's event loop, so the cache needs no lock
+        entry = self._data_view_cache.get(space_id)
+        if refresh or entry is None or time.monotonic() - entry[0] > self.data_view_cache_ttl:
+            url = f"{self.kibana_base_url}/s/{space_id}/api/data_views"
+            response = await self._request('GET', url, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch index patterns: {response.text}")
+
+            data_view_ids = {}
+            for data_view in response.json().get('data_view', []):
+                data_view_ids.setdefault(data_view.get('name'), data_view["id"])
+            entry = (time.monotonic(), data_view_ids)
+            self._data_view_cache[space_id] = entry
+        return entry[1]
+
+    def invalidate_data_view_cache(self, space_id=None):
+        """
+        Drop the cached data views of one space, or of every space
+        """
+        if space_id is None:
+            self._data_view_cache.clear()
+        else:
+            self._data_view_cache.pop(space_id, None)
+
+    async def _get_json(self, url, error_message=None):
+        response = await self._request('GET', url, headers={"kbn-xsrf": "true"})
+        if response.status_code == 200:
+            return response.json()
+        if error_message:
+            raise Exception(f"{error_message}: {response.text}")
+        return {"status": "error", "message": response.text}
+
+    async def get_alias_structure(self, alias_name):
+        return await self._get_json(f"{self.elastic_base_url}/_alias/{alias_name}", "Failed to retrieve alias structure")
+
+    async def get_kibana_features(self):
+        features = await self._get_json(f"{self.kibana_base_url}/api/features", "Failed to retrieve Kibana features")
+        return [feature["id"] for feature in features]
+
+    async def get_spaces(self):
+        return await self._get_json(f"{self.kibana_base_url}/api/spaces/space?include_authorized_purposes=true")
+
+    async def get_roles(self):
+        return await self._get_json(f"{self.kibana_base_url}/api/security/role")
+
+    async def get_users(self):
+        return await self._get_json(f"{self.elastic_base_url}/_security/user")
+
+    async def get_dataviews(self):
+        return await self._get_json(f"{self.kibana_base_url}/api/data_views", "Failed to fetch dataviews")
+
+
+class SyncFacade:
+    """
+    Blocking facade over AsyncElasticAutomation for synchronous callers
+
+    The async client runs on a private event loop in a background thread.
+    Every coroutine method of the client is exposed as a blocking method, and
+    gather() submits many calls to the loop at once so that thousands of
+    requests can be in flight from one thread.
+    """
+    def __init__(self, automation):
+        self.automation = automation
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-automation", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def __getattr__(self, name):
+        method = getattr(self.automation, name)
+        if not inspect.iscoroutinefunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            return self._run(method(*args, **kwargs))
+        return call
+
+    def gather(self, calls):
+        """
+        Run many client calls concurrently and wait for all of them
+
+        Args:
+            calls (list): (method_name, args, kwargs) tuples
+
+        Returns:
+            list: One result per call, in order. A call that raised is reported
+                as {"status": "error", "message": ...}
+        """
+        async def run(name, args, kwargs):
+            try:
+                return await getattr(self.automation, name)(*args, **kwargs)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+
+        async def run_all():
+            return await asyncio.gather(*(run(name, args, kwargs) for name, args, kwargs in calls))
+
+        return self._run(run_all())
+
+    def close(self):
+        """
+        Close the client connection pool and stop the event loop
+        """
+        self._run(self.automation.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def onboard_tenants(facade, client_ids, index_pattern, steps=None):
+    """
+    Onboard many tenants from one event loop
+
+    Aliases of all tenants go out in bulk. The spaces and roles of every
+    tenant are then sent at once, followed by the users and data views that
+    need them; a step whose dependency did not succeed is skipped, as in
+    onboard_tenant. copy_dashboards is not covered.
+
+    Args:
+        facade (SyncFacade): Facade over the client to onboard with
+        client_ids (list): Client IDs of the tenants
+        index_pattern (str): Index pattern the tenant aliases filter
+        steps (iterable): Names from ASYNC_TENANT_STEPS to run, all of them when None
+
+    Returns:
+        list: {"client_id", "status", "results"} per tenant, in order
+    """
+    steps = [name for name in ASYNC_TENANT_STEPS if steps is None or name in steps]
+    depends_on = dict(TENANT_STEPS)
+    results = {client_id: {} for client_id in client_ids}
+
+    if "create_index_alias" in steps and client_ids:
+        aliases = {client_id: f'client_{client_id}_alias' for client_id in client_ids}
+        for result in facade.create_index_aliases(index_pattern, aliases):
+            results[result["client_id"]]["create_index_alias"] = {"status": result["status"], "message": result["message"]}
+
+    def call(client_id, name):
+        bi_client_name = f'client_{client_id}'
+        return {
+            "create_space": ("create_space", (f'{bi_client_name}_space',),
+                             {"name": f'{bi_client_name} Space', "description": "Space for events analysis"}),
+            "create_role": ("create_role", (), {"role_name": f'{bi_client_name}_role', "indice": f'{bi_client_name}_alias',
+                                                "space": f'{bi_client_name}_space'}),
+            "create_user": ("create_user", (), {"username": bi_client_name, "password": bi_client_name,
+                                                "roles": [f'{bi_client_name}_role']}),
+            "create_data_view": ("create_data_view", (), {"space_id": f'{bi_client_name}_space',
+                                                          "dataview_name": f'{bi_client_name}_data_view',
+                                                          "index_pattern": f'{bi_client_name}_alias'}),
+        }[name]
+
+    for names in ASYNC_TENANT_ROUNDS:
+        keys, calls = [], []
+        for client_id in client_ids:
+            for name in names:
+                if name not in steps:
+                    continue
+                blocked = [dependency for dependency in depends_on[name]
+                           if dependency in results[client_id] and results[client_id][dependency].get("status") != "success"]
+                if blocked:
+                    results[client_id][name] = {"status": "skipped",
+                                                "message": f"Skipped because {', '.join(blocked)} did not succeed"}
+                    continue
+                keys.append((client_id, name))
+                calls.append(call(client_id, name))
+        for (client_id, name), result in zip(keys, facade.gather(calls)):
+            results[client_id][name] = result
+
+    tenants = []
+    for client_id in client_ids:
+        operations = [{"operation": name, "result": results[client_id][name]}
+                      for name in steps if name in results[client_id]]
+        failed = any(step_failed(operation["result"]) or operation["result"].get("status") == "skipped"
+                     for operation in operations)
+        tenants.append({"client_id": client_id, "status": "error" if failed else "success", "results": operations})
+    return tenants
@@ -1,17 +1,486 @@
+import fnmatch
+import hashlib
+import io
+import contextvars
 import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 
+from app.logger import log_context
+from app.metrics import current_operation, instrumented, observe_request
 from app.models import Configuration
+from app.resilience import (FAILURE_STATUSES, IDEMPOTENT_METHODS, OVERLOAD_STATUSES, AdaptiveLimiter,
+                            CircuitBreaker, RetryPolicy)
+from app.transport import SessionTransport
+
+logger = logging.getLogger(__name__)
+
+# Dashboards copied from the default space into every tenant space
+DEFAULT_DASHBOARD_IDS = [
+    "3a81edc6-40d2-435a-87a3-41ce352a523d",  # people_count_dashboard_id
+    "5b898e8b-12e9-4638-acf3-34fea03e7b61",  # people_count_area_dashboard_id
+    "e1f0588e-41fd-45b8-8160-e334b866f2f7"   # car_count_dashboard_id
+]
+DEFAULT_SOURCE_DATA_VIEW = "DGuard Demo"
+
+# Exported bundles larger than this are spooled to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Size of the chunks streamed in an import request body
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Saved object types moved by migrate_space, in tiers: each tier is imported
+# after the ones it may reference
+MIGRATION_TYPE_TIERS = [
+    ("index-pattern",),
+    ("search", "tag"),
+    ("visualization", "lens", "map"),
+    ("dashboard",),
+]
+MIGRATION_TYPES = tuple(saved_object_type for tier in MIGRATION_TYPE_TIERS for saved_object_type in tier)
+
+# Kibana rejects imports over savedObjects.maxImportPayloadBytes (26214400 by
+# default), keep some headroom for the multipart envelope
+MAX_IMPORT_PAYLOAD_BYTES = 25 * 1024 * 1024
+
+# Kibana rejects a _find whose page * per_page exceeds the max result window
+# of the .kibana index (10000 by default)
+MAX_FIND_WINDOW = 10000
+
+# Kibana features hidden in tenant spaces, which only expose dashboards
+DISABLED_FEATURES = [
+    'enterpriseSearch', 'discover', 'canvas', 'maps', 'ml', 'logs', 'visualize', 'infrastructure', 
+    'apm', 'uptime', 'observabilityCases', 'siem', 'securitySolutionCases', 'slo', 'dev_tools', 'advancedSettings', 
+    'filesManagement', 'filesSharedImage', 'savedObjectsManagement', 'savedQueryManagement', 
+    'savedObjectsTagging', 'osquery', 'actions', 'generalCases', 'guidedOnboardingFeature', 'rulesSettings', 
+    'maintenanceWindow', 'stackAlerts', 'fleetv2', 'fleet', 'monitoring']
+
+def alias_add_action(index_pattern, alias_name, client_id):
+    """
+    Build an _aliases "add" action filtering the index pattern by client_id
+    """
+    return {
+        "add": {
+            "index": index_pattern,
+            "alias": alias_name,
+            "filter": {
+                "term": {
+                    "client_id": client_id
+                }
+            }
+        }
+    }
+
+def role_payload(indice, space):
+    """
+    Build a role granting read access to the index pattern and the dashboards of the space
+    """
+    return {
+        "indices": [
+            {
+                "names": indice,
+                "privileges": ["read", "view_index_metadata"]
+            }
+        ],
+        "applications": [
+            {
+              "application": "kibana-.kibana",
+              "privileges": ["feature_dashboard.read"],
+              "resources": [f"space:{space}"]
+            }
+        ]
+    }
+
+def user_payload(username, password, roles):
+    return {
+        "password": password,
+        "roles": roles,
+        "full_name": username,
+        "enabled": True
+    }
+
+def data_view_payload(dataview_name, index_pattern):
+    return {
+        "data_view": {
+            "title": index_pattern,
+            "name": dataview_name,
+            "timeFieldName": "event_timestamp"
+        }
+    }
+
+def space_payload(space_id, name, description=""):
+    return {
+        "id": space_id,
+        "name": name,
+        "description": description,
+        "disabledFeatures": DISABLED_FEATURES
+    }
+
+def export_payload(dashboard_id):
+    """
+    Build a saved objects export request for a dashboard and everything it references
+    """
+    return {
+      "objects": [
+        {
+          "type": "dashboard",
+          "id": dashboard_id
+        }
+      ],
+      "includeReferencesDeep": True,
+      "excludeExportDetails": False
+    }
+
+def summarize_results(results, success_message, error_message):
+    """
+    Fold per-item results into an overall status: success, partial or error
+    """
+    succeeded = sum(1 for result in results if result.get("status") == "success")
+    failed = len(results) - succeeded
+
+    if failed == 0:
+        status, message = "success", success_message
+    elif succeeded == 0:
+        status, message = "error", error_message
+    else:
+        status, message = "partial", f"{error_message}: {failed} of {len(results)} failed"
+
+    return {"status": status, "message": message, "succeeded": succeeded, "failed": failed, "results": results}
+
+def map_in_context(executor, func, items):
+    """
+    executor.map running every call in a copy of the caller's context, so the
+    running operation (metrics) and log fields follow the work onto the pool
+    """
+    calls = [(contextvars.copy_context(), item) for item in items]
+    return executor.map(lambda call: call[0].run(func, call[1]), calls)
+
+def connect_failed(error):
+    """
+    Whether a requests exception was raised before the connection was open,
+    so the request cannot have reached the server
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying error
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+def find_data_view_id(lines, data_view):
+    """
+    Find the ID of a data view object in an exported NDJSON bundle
+
+    Args:
+        lines (iterable): NDJSON lines of the bundle
+        data_view (str): Data view name, title or ID
+
+    Returns:
+        str: The data view ID, or None if the bundle does not contain it
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+        if saved_object.get('type') != 'index-pattern':
+            continue
+        attributes = saved_object.get('attributes', {})
+        if data_view in (saved_object.get('id'), attributes.get('name'), attributes.get('title')):
+            return saved_object['id']
+    return None
+
+def normalize_saved_object(saved_object):
+    """
+    The parts of a saved object that define its content: type, id, attributes
+    and references, in a stable order. Timestamps, version and migration
+    fields change on every write and are left out.
+    """
+    references = sorted(saved_object.get('references', []),
+                        key=lambda ref: (ref.get('type') or '', ref.get('id') or '', ref.get('name') or ''))
+    return {
+        "type": saved_object.get('type'),
+        "id": saved_object.get('id'),
+        "attributes": saved_object.get('attributes', {}),
+        "references": references,
+    }
+
+def saved_object_fingerprint(saved_object):
+    """
+    SHA-256 of the normalized attributes and references of a saved object
+
+    Equal fingerprints mean an import would not change the object.
+    """
+    normalized = json.dumps(normalize_saved_object(saved_object), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def bundle_fingerprints(lines):
+    """
+    Fingerprint of every saved object of an NDJSON bundle, keyed by (type, id)
+    """
+    fingerprints = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+        if 'type' not in saved_object:
+            continue
+        fingerprints[(saved_object['type'], saved_object['id'])] = saved_object_fingerprint(saved_object)
+    return fingerprints
+
+def changed_saved_objects(fingerprints, current):
+    """
+    Keys of the bundle objects that are missing from or differ in the target space
+
+    Copies are matched by origin, and their own ID and the IDs they
+    reference are mapped back to the source IDs before fingerprinting, so
+    an object whose copy got a new ID still compares equal.
+
+    Args:
+        fingerprints (dict): Bundle fingerprints, as returned by bundle_fingerprints
+        current (dict): Target space objects keyed by (type, originId or id)
+
+    Returns:
+        set: (type, id) of the new or changed objects
+    """
+    source_ids = {(saved_object['type'], saved_object['id']): origin
+                  for (_, origin), saved_object in current.items()}
+
+    def as_source(key, saved_object):
+        references = [dict(ref, id=source_ids.get((ref.get('type'), ref.get('id')), ref.get('id')))
+                      for ref in saved_object.get('references', [])]
+        return dict(saved_object, id=key[1], references=references)
+
+    return {key for key, fingerprint in fingerprints.items()
+            if key not in current or saved_object_fingerprint(as_source(key, current[key])) != fingerprint}
+
+def select_saved_objects(lines, keys):
+    """
+    Keep the NDJSON lines of the saved objects whose (type, id) is in keys
+
+    Yields:
+        bytes: The selected lines
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+        if (saved_object.get('type'), saved_object.get('id')) in keys:
+            yield line
+
+def bundle_hash(lines):
+    """
+    SHA-256 of the normalized objects of an NDJSON bundle, independent of
+    their order and of the export details line
+
+    Args:
+        lines (iterable): NDJSON lines of the bundle
+
+    Returns:
+        str: Hex digest
+    """
+    objects = []
+    for line in lines:
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+        if 'type' not in saved_object:
+            continue
+        objects.append(json.dumps(normalize_saved_object(saved_object), sort_keys=True, separators=(',', ':')))
+
+    digest = hashlib.sha256()
+    for normalized in sorted(objects):
+        digest.update(normalized.encode('utf-8') + b"\n")
+    return digest.hexdigest()
+
+def rewrite_data_view_references(lines, source_data_view_id, target_data_view_id):
+    """
+    Point every reference to the source data view at the target data view
+
+    The source data view object is dropped from the bundle, every other line
+    is passed through with its index-pattern references rewritten.
+
+    Args:
+        lines (iterable): NDJSON lines of the bundle
+        source_data_view_id (str): ID of the data view the bundle was exported with
+        target_data_view_id (str): ID of the data view to use in the target space
+
+    Yields:
+        bytes: The rewritten NDJSON lines
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+
+        if saved_object.get('type') == 'index-pattern' and saved_object.get('id') == source_data_view_id:
+            continue
+
+        for ref in saved_object.get('references', []):
+            if ref.get('type') == 'index-pattern' and ref.get('id') == source_data_view_id:
+                ref['id'] = target_data_view_id
+
+        yield json.dumps(saved_object).encode('utf-8')
+
+class SavedObjectBundle:
+    """
+    Exported NDJSON kept in memory up to max_size bytes and spooled to a temporary file beyond
+
+    Every call to lines() opens an independent iterator, so several imports
+    can read the same bundle concurrently.
+    """
+    def __init__(self, max_size=SPOOL_MAX_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.count = 0
+        self._buffer = io.BytesIO()
+        self._path = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def from_content(content, max_size=SPOOL_MAX_SIZE):
+        """
+        Wrap exported content: bytes, str or an iterable of NDJSON lines
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        bundle = SavedObjectBundle(max_size=max_size)
+        bundle.extend(content.splitlines() if isinstance(content, bytes) else content)
+        return bundle
+
+    def append(self, line):
+        line = line.rstrip(b"\r\n")
+        if not line.strip():
+            return
+        if self._file is None and self.size + len(line) + 1 > self.max_size:
+            fd, self._path = tempfile.mkstemp(suffix=".ndjson")
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        (self._file or self._buffer).write(line + b"\n")
+        self.size += len(line) + 1
+        self.count += 1
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def lines(self):
+        """
+        Iterate over the NDJSON lines, each ending with a newline
+        """
+        if self._file is None:
+            yield from io.BytesIO(self._buffer.getvalue())
+            return
+        self._file.flush()
+        with open(self._path, "rb") as spooled:
+            yield from spooled
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.remove(self._path)
+            self._file = None
+            self._path = None
+        self._buffer = io.BytesIO()
+        self.size = 0
+        self.count = 0
+
+def multipart_ndjson(lines, boundary, filename="export.ndjson"):
+    """
+    Stream NDJSON lines as a multipart/form-data body with a single "file" field
+
+    Args:
+        lines (iterable): NDJSON lines, with or without trailing newlines
+        boundary (str): Multipart boundary, also sent in the Content-Type header
+        filename (str): File name announced for the field
+
+    Yields:
+        bytes: Chunks of roughly UPLOAD_CHUNK_SIZE bytes
+    """
+    chunk = bytearray(
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: application/ndjson\r\n\r\n'.encode('utf-8')
+    )
+    for line in lines:
+        line = line.rstrip(b"\r\n")
+        if not line.strip():
+            continue
+        chunk += line + b"\n"
+        if len(chunk) >= UPLOAD_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    yield bytes(chunk)
 
 class ElasticAutomation:
     def __init__(self, elastic_host, elastic_port, kibana_host, kibana_port, username, password,
-                 verify_ssl=True, ca_cert_path=None):
-        self.elastic_base_url = f"https://{elastic_host}:{elastic_port}"
-        self.kibana_base_url = f"https://{kibana_host}:{kibana_port}"
+                 verify_ssl=True, ca_cert_path=None, pool_connections=4, pool_maxsize=None, keep_alive=True,
+                 data_view_cache_ttl=300, inventory_cache_ttl=60, timeout=(10, 120), retries=3, backoff=0.5,
+                 max_backoff=30, failure_threshold=5, reset_timeout=30, max_concurrency=32, scheme="https",
+                 transport=None, template_store=None):
+        self.elastic_base_url = f"{scheme}://{elastic_host}:{elastic_port}"
+        self.kibana_base_url = f"{scheme}://{kibana_host}:{kibana_port}"
         self.auth = (username, password)
         self.headers = {'Content-Type': 'application/json', 'kbn-xsrf': 'true'}
         self.verify_ssl = ca_cert_path if ca_cert_path else verify_ssl
 
+        # Pooled sessions per base URL by default; a RecordingTransport or
+        # ReplayTransport from app.transport captures or replays the traffic.
+        # The pool holds as many connections as requests may be in flight per
+        # host, so none is discarded and reopened under load.
+        pool_maxsize = pool_maxsize or max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self.transport = transport or SessionTransport(self.auth, self.verify_ssl, pool_connections,
+                                                       pool_maxsize, keep_alive)
+
+        # Stored dashboard bundles served by copy_dashboards instead of live
+        # exports, an app.templateStore.TemplateStore when set
+        self.template_store = template_store
+
+        # Data view name -> ID per space, filled from one list call per space
+        self.data_view_cache_ttl = data_view_cache_ttl
+        self._data_view_cache = {}
+        self._data_view_space_locks = {}
+        self._data_view_cache_lock = threading.Lock()
+
+        # Listings served to the UI (spaces, roles, users, dataviews), dropped on writes
+        self.inventory_cache_ttl = inventory_cache_ttl
+        self._inventory_cache = {}
+        self._inventory_cache_lock = threading.Lock()
+
+        # Every call has a (connect, read) timeout and is retried with backoff;
+        # each host gets its own circuit breaker and adaptive concurrency limit
+        self.timeout = timeout
+        self.retry_policy = RetryPolicy(retries=retries, backoff=backoff, max_backoff=max_backoff)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrency = max_concurrency
+        self._breakers = {}
+        self._limiters = {}
+        self._guards_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @staticmethod
     def from_config(config):
         return ElasticAutomation(
@@ -22,9 +491,136 @@ class ElasticAutomation:
             config.get('es_user', 'elastic'), 
             config.get('es_pass', ''), 
             config.get('verify_ssl', False), 
-            config.get('ca_cert_path', None)
+            config.get('ca_cert_path', None),
+            pool_connections=config.get('pool_connections', 4),
+            pool_maxsize=config.get('pool_maxsize'),
+            keep_alive=config.get('keep_alive', True),
+            data_view_cache_ttl=config.get('data_view_cache_ttl', 300),
+            inventory_cache_ttl=config.get('inventory_cache_ttl', 60),
+            timeout=config.get('timeout', (10, 120)),
+            retries=config.get('retries', 3),
+            max_concurrency=config.get('max_concurrency', 32),
+            scheme=config.get('scheme', 'https')
         )
 
+    @staticmethod
+    def from_configuration(config, scheme='https', template_store=None, max_concurrency=32, pool_maxsize=None):
+        """
+        Build a client from a stored Configuration row
+
+        Args:
+            config (Configuration): Configuration to connect with
+            scheme (str): http or https
+            template_store (TemplateStore): Dashboard templates to copy from
+            max_concurrency (int): Requests in flight per host at most
+            pool_maxsize (int): Pooled connections per host, max_concurrency by default
+        """
+        return ElasticAutomation(
+            config.es_url,
+            config.es_port,
+            config.kb_url,
+            config.kb_port,
+            config.es_user,
+            config.es_pass,
+            verify_ssl=False,
+            scheme=scheme,
+            template_store=template_store,
+            max_concurrency=max_concurrency,
+            pool_maxsize=pool_maxsize
+        )
+
+    def _base_url_for(self, url):
+        if url.startswith(self.elastic_base_url):
+            return self.elastic_base_url
+        if url.startswith(self.kibana_base_url):
+            return self.kibana_base_url
+        raise ValueError(f"URL {url} does not belong to the Elasticsearch or Kibana host")
+
+    def _guards(self, url):
+        """
+        Return the circuit breaker and adaptive limiter of the host of a request URL
+
+        Args:
+            url (str): Full request URL
+        """
+        base_url = self._base_url_for(url)
+        with self._guards_lock:
+            if base_url not in self._breakers:
+                self._breakers[base_url] = CircuitBreaker(base_url, self.failure_threshold, self.reset_timeout)
+                self._limiters[base_url] = AdaptiveLimiter(maximum=min(self.pool_maxsize, self.max_concurrency))
+            return self._breakers[base_url], self._limiters[base_url]
+
+    def _request(self, method, url, **kwargs):
+        """
+        Send a request through the transport
+
+        Connection errors and retryable statuses (429, 502, 503, 504) are retried
+        per the retry policy, honouring Retry-After. Requests with a
+        non-idempotent method are only resent after errors raised before the
+        connection was open. Every attempt passes the
+        host's circuit breaker and waits for a slot of its adaptive limiter.
+        A callable data argument is a body factory called once per attempt, so
+        streamed bodies can be sent again; any other iterator is sent only once.
+
+        Args:
+            method (str): HTTP method
+            url (str): Full request URL
+            **kwargs: Passed on to requests; timeout defaults to self.timeout
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        body = kwargs.pop('data', None)
+        replayable = body is None or callable(body) or isinstance(body, (bytes, str, dict, list, tuple))
+
+        breaker, limiter = self._guards(url)
+        policy = self.retry_policy
+
+        attempt = 0
+        while True:
+            breaker.before_call()
+            limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.transport.send(method, url, data=body() if callable(body) else body, **kwargs)
+            except Exception as e:
+                observe_request(url, method, type(e).__name__, time.perf_counter() - started)
+                limiter.release(overloaded=isinstance(e, (requests.ConnectionError, requests.Timeout)))
+                breaker.record_failure()
+                # Only a request that never reached the server is safe to send again
+                # whatever its method; a dropped connection or a read timeout may come
+                # after the server acted on it
+                if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    resendable = method.upper() in IDEMPOTENT_METHODS or connect_failed(e)
+                    retry = replayable and resendable and attempt < policy.retries
+                else:
+                    retry = False
+                if not retry:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                status = response.status_code
+                observe_request(url, method, status, time.perf_counter() - started)
+                limiter.release(overloaded=status in OVERLOAD_STATUSES)
+                if status in FAILURE_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if status not in policy.statuses or not replayable or attempt >= policy.retries:
+                    return response
+                delay = policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        """
+        Close the transport and release its connections
+        """
+        self.transport.close()
+
+    @instrumented
     def create_index_alias(self, index_pattern, alias_name, client_id):
         """
         Create an index alias with client_id filter
@@ -37,31 +633,62 @@ class ElasticAutomation:
         if client_id is None:
             raise ValueError("client_id is required to create an alias")
         
-        self.print_log(f"Creating alias {alias_name} for index pattern {index_pattern} with client_id filter {client_id}")
+        self.log(f"Creating alias {alias_name} for index pattern {index_pattern} with client_id filter {client_id}", client_id=client_id)
         
         url = f"{self.elastic_base_url}/_aliases"
         payload = {
-            "actions": [
-                {
-                    "add": {
-                        "index": index_pattern,
-                        "alias": alias_name,
-                        "filter": {
-                            "term": {
-                                "client_id": client_id
-                            }
-                        }
-                    }
-                }
-            ]
+            "actions": [alias_add_action(index_pattern, alias_name, client_id)]
         }
-        response = requests.post(url, json=payload, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('POST', url, json=payload)
 
         if response.status_code == 200:
             return {"status": "success", "message": "Alias created successfully"}
         else:
             return {"status": "error", "message": response.text}
 
+    @instrumented
+    def create_index_aliases(self, index_pattern, aliases, chunk_size=500):
+        """
+        Create many client_id filtered aliases with one atomic _aliases request per chunk
+
+        Args:
+            index_pattern (str): Index pattern to apply the aliases
+            aliases (dict): Alias name to create, keyed by client ID
+            chunk_size (int): Maximum number of add actions per request
+
+        Returns:
+            list: One result per alias, in the order given
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        items = list(aliases.items())
+        if any(client_id is None for client_id, _ in items):
+            raise ValueError("client_id is required to create an alias")
+
+        self.log(f"Creating {len(items)} aliases for index pattern {index_pattern} in chunks of {chunk_size}")
+
+        url = f"{self.elastic_base_url}/_aliases"
+        results = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            payload = {
+                "actions": [alias_add_action(index_pattern, alias_name, client_id) for client_id, alias_name in chunk]
+            }
+            response = self._request('POST', url, json=payload)
+
+            # The actions of a chunk are applied atomically, so they share one outcome
+            if response.status_code == 200:
+                status, message = "success", "Alias created successfully"
+            else:
+                status, message = "error", response.text
+
+            for client_id, alias_name in chunk:
+                results.append({"client_id": client_id, "alias": alias_name, "status": status, "message": message})
+
+        return results
+
+    @instrumented
     def create_role(self, role_name, indice, space):
         """
         Create a role with specified index privileges
@@ -72,33 +699,19 @@ class ElasticAutomation:
             space (str): Space name to apply the role        
         """
 
-        self.print_log(f"Creating role {role_name} for index pattern {indice} and space {space}")
+        self.log(f"Creating role {role_name} for index pattern {indice} and space {space}", space=space)
 
         url = f"{self.elastic_base_url}/_security/role/{role_name}"
-        privileges=["read", "view_index_metadata"]
-
-        payload = {
-            "indices": [
-                {
-                    "names": indice,
-                    "privileges": privileges
-                }
-            ],
-            "applications": [
-                {
-                  "application": "kibana-.kibana",
-                  "privileges": ["feature_dashboard.read"],
-                  "resources": [f"space:{space}"]
-                }
-            ]
-        }
-        response = requests.put(url, json=payload, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        payload = role_payload(indice, space)
+        response = self._request('PUT', url, json=payload, headers=self.headers)
+        self.invalidate_inventory("roles")
         
         if response.status_code == 200:
             return {"status": "success", "message": "Role created successfully"}
         else:
             return {"status": "error", "message": response.text}
 
+    @instrumented
     def create_user(self, username, password, roles):
         """
         Create a user and assign roles
@@ -109,22 +722,19 @@ class ElasticAutomation:
             roles (list): List of roles to assign
         """
 
-        self.print_log(f"Creating user {username} with roles {roles}")
+        self.log(f"Creating user {username} with roles {roles}")
 
         url = f"{self.elastic_base_url}/_security/user/{username}"
-        payload = {
-            "password": password,
-            "roles": roles,
-            "full_name": username,
-            "enabled": True
-        }
-        response = requests.put(url, json=payload, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        payload = user_payload(username, password, roles)
+        response = self._request('PUT', url, json=payload, headers=self.headers)
+        self.invalidate_inventory("users")
         
         if response.status_code == 200:
             return {"status": "success", "message": "User created successfully"}
         else:
             return {"status": "error", "message": response.text}
 
+    @instrumented
     def create_data_view(self, space_id, dataview_name, index_pattern):
         """
         Create a data view in Kibana
@@ -135,23 +745,24 @@ class ElasticAutomation:
             index_pattern (str): Index pattern to associate with the data view
         """
 
-        self.print_log(f"Creating data view {dataview_name} for index pattern {index_pattern} in space {space_id}")
+        self.log(f"Creating data view {dataview_name} for index pattern {index_pattern} in space {space_id}", space=space_id)
 
         url = f"{self.kibana_base_url}/s/{space_id}/api/data_views/data_view"
-        payload = {
-            "data_view": {
-                "title": index_pattern,
-                "name": dataview_name,
-                "timeFieldName": "event_timestamp"
-            }
-        }
-        response = requests.post(url, json=payload, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        payload = data_view_payload(dataview_name, index_pattern)
+        response = self._request('POST', url, json=payload, headers=self.headers)
+        self.invalidate_inventory("dataviews")
         
         if response.status_code == 200:
+            data_view_id = response.json().get('data_view', {}).get('id')
+            if data_view_id:
+                self._remember_data_view(space_id, dataview_name, data_view_id)
+            else:
+                self.invalidate_data_view_cache(space_id)
             return {"status": "success", "message": "Data View created successfully"}
         else:
             return {"status": "error", "message": response.text}
 
+    @instrumented
     def create_space(self, space_id, name, description=""):
         """
         Create a Kibana space
@@ -161,30 +772,19 @@ class ElasticAutomation:
             name (str): Name of the space
             description (str): Description of the space
         """
-        self.print_log(f"Creating space {name} with ID {space_id}")
+        self.log(f"Creating space {name} with ID {space_id}", space=space_id)
 
         url = f"{self.kibana_base_url}/api/spaces/space"
-
-        disabled_features = [
-            'enterpriseSearch', 'discover', 'canvas', 'maps', 'ml', 'logs', 'visualize', 'infrastructure', 
-            'apm', 'uptime', 'observabilityCases', 'siem', 'securitySolutionCases', 'slo', 'dev_tools', 'advancedSettings', 
-            'filesManagement', 'filesSharedImage', 'savedObjectsManagement', 'savedQueryManagement', 
-            'savedObjectsTagging', 'osquery', 'actions', 'generalCases', 'guidedOnboardingFeature', 'rulesSettings', 
-            'maintenanceWindow', 'stackAlerts', 'fleetv2', 'fleet', 'monitoring']
-
-        payload = {
-            "id": space_id,
-            "name": name,
-            "description": description,
-            "disabledFeatures": disabled_features
-        }
-        response = requests.post(url, json=payload, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        payload = space_payload(space_id, name, description)
+        response = self._request('POST', url, json=payload, headers=self.headers)
+        self.invalidate_inventory("spaces")
         
         if response.status_code == 200:
             return {"status": "success", "message": "Space created successfully"}
         else:
             return {"status": "error", "message": response.text}
     
+    @instrumented
     def get_alias_structure(self, alias_name):
         """
         Retrieve the structure of an alias, including its associated indices and filters.
@@ -195,16 +795,17 @@ class ElasticAutomation:
         Returns:
             dict: The alias structure, including indices and filters.
         """
-        self.print_log(f"Retrieving alias structure for {alias_name}")
+        self.log(f"Retrieving alias structure for {alias_name}")
 
         url = f"{self.elastic_base_url}/_alias/{alias_name}"
-        response = requests.get(url, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=self.headers)
         
         if response.status_code == 200:
             return response.json()
         else:
             raise Exception(f"Failed to retrieve alias structure: {response.status_code} - {response.text}")
       
+    @instrumented
     def get_kibana_features(self):
         """
         Retrieve a list of all Kibana features.
@@ -212,10 +813,10 @@ class ElasticAutomation:
         Returns:
             list: A list of feature IDs that can be used in disabledFeatures.
         """
-        self.print_log("Retrieving Kibana features")
+        self.log("Retrieving Kibana features")
 
         url = f"{self.kibana_base_url}/api/features"
-        response = requests.get(url, auth=self.auth, headers=self.headers, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=self.headers)
 
         if response.status_code != 200:
             raise Exception(f"Failed to retrieve Kibana features: {response.status_code} - {response.text}")
@@ -224,6 +825,7 @@ class ElasticAutomation:
         feature_ids = [feature["id"] for feature in features]
         return feature_ids
     
+    @instrumented
     def export_dashboard(self, dashboard_id, source_space_id='default'):
         """
         Export a dashboard from a specific space
@@ -232,131 +834,323 @@ class ElasticAutomation:
             dashboard_id (str): ID of the dashboard to export
             space_id (str): Optional space ID. If None, uses default space
         """
-        self.print_log(f"Exporting dashboard {dashboard_id} from space {source_space_id}")
+        self.log(f"Exporting dashboard {dashboard_id} from space {source_space_id}", space=source_space_id)
 
         url = f"{self.kibana_base_url}/s/{source_space_id}/api/saved_objects/_export"
         headers = {'kbn-xsrf': 'true', 'Content-Type': 'application/json'}
         
-        payload = json.dumps({
-          "objects": [
-            {
-              "type": "dashboard",
-              "id": dashboard_id
-            }
-          ],
-          "includeReferencesDeep": True,
-          "excludeExportDetails": False
-        })
+        payload = json.dumps(export_payload(dashboard_id))
 
-        response = requests.post(url, data=payload, auth=self.auth, headers=headers, verify=self.verify_ssl)
+        response = self._request('POST', url, data=payload, headers=headers)
         
         if response.status_code == 200:
             return response.content
         else:
             return {"status": "error", "message": response.text}
-            
 
-    def import_dashboard(self, export_content, target_space_id, source_data_view, target_data_view):
+    @instrumented
+    def export_saved_objects(self, payload, source_space_id='default', spool_max_size=SPOOL_MAX_SIZE):
         """
-        Import a dashboard into a specific space and update its data view
-        
+        Stream a saved objects export line by line into a SavedObjectBundle
+
         Args:
-            export_content (bytes): The exported dashboard content
-            source_space_id (str): Source space ID
-            target_space_id (str): Target space ID
-            source_data_view (str): Original data view ID/name
-            target_data_view (str): New data view ID/name to use
+            payload (dict): Body of the _export request
+            source_space_id (str): Space to export from
+            spool_max_size (int): Bytes kept in memory before spooling to disk
+
+        Returns:
+            SavedObjectBundle: The exported NDJSON, owned by the caller
+        """
+        url = f"{self.kibana_base_url}/s/{source_space_id}/api/saved_objects/_export"
+        headers = {'kbn-xsrf': 'true', 'Content-Type': 'application/json'}
+
+        with self._request('POST', url, json=payload, headers=headers, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Export failed: {response.text}")
+
+            bundle = SavedObjectBundle(max_size=spool_max_size)
+            try:
+                bundle.extend(response.iter_lines(chunk_size=UPLOAD_CHUNK_SIZE))
+            except Exception:
+                bundle.close()
+                raise
+            return bundle
+
+    @instrumented
+    def export_dashboard_bundle(self, dashboard_id, source_space_id='default', spool_max_size=SPOOL_MAX_SIZE):
+        """
+        Export a dashboard and its references without holding the whole response in memory
+
+        Args:
+            dashboard_id (str): ID of the dashboard to export
+            source_space_id (str): Space to export from
+            spool_max_size (int): Bytes kept in memory before spooling to disk
+
+        Returns:
+            SavedObjectBundle: The exported NDJSON, owned by the caller
+        """
+        self.log(f"Exporting dashboard {dashboard_id} from space {source_space_id}", space=source_space_id)
+        return self.export_saved_objects(export_payload(dashboard_id), source_space_id, spool_max_size)
+
+    @instrumented
+    def import_saved_objects(self, lines, target_space_id, overwrite=True):
         """
-        self.print_log(f"Importing dashboard to space {target_space_id} and updating data view from {source_data_view} to {target_data_view}")
+        Import NDJSON lines into a space with a streamed multipart body
+
+        Args:
+            lines (iterable|callable): NDJSON lines to upload, or a function
+                returning a fresh iterable of them so a failed upload can be resent
+            target_space_id (str): Space to import into
+            overwrite (bool): Overwrite objects that already exist
 
+        Returns:
+            dict: The _import response
+        """
         url = f"{self.kibana_base_url}/s/{target_space_id}/api/saved_objects/_import"
-        
-        params = {"overwrite": "true", "createNewCopies": "false"}
-        
-        # Create the multipart form data
-        files = {
-          'file': ('dashboard.ndjson', export_content if isinstance(export_content, bytes) else export_content.encode('utf-8'), 'application/ndjson'),
-        }
+        params = {"overwrite": "true" if overwrite else "false", "createNewCopies": "false"}
 
-        
-        headers = {'kbn-xsrf': 'true'}
+        boundary = uuid.uuid4().hex
+        headers = {'kbn-xsrf': 'true', 'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+        if callable(lines):
+            body = lambda: multipart_ndjson(lines(), boundary)
+        else:
+            body = multipart_ndjson(lines, boundary)
+
+        response = self._request('POST', url, data=body, params=params, headers=headers)
 
-        # First import the dashboard
-        response = requests.post(url, files=files, params=params, auth=self.auth, headers=headers, verify=self.verify_ssl)
-        
         if response.status_code != 200:
             raise Exception(f"Import failed: {response.text}")
-        
-        # Get the imported dashboard ID from the response
+
         import_result = response.json()
 
-        source_data_view_id = self.get_data_view_id(target_space_id, source_data_view,headers)
-        target_data_view_id = self.get_data_view_id(target_space_id, target_data_view,headers)
-        
-        # Now update the data view reference
-        for success_item in import_result.get('successResults', []):
-            if success_item['type'] == 'dashboard':
-                dashboard_id = success_item['destinationId']
-                update_url = f"{self.kibana_base_url}/s/{target_space_id}/api/saved_objects/dashboard/{dashboard_id}"
-                
-                # Get current dashboard configuration
-                get_response = requests.get(update_url, auth=self.auth, 
-                                          headers=self.headers, verify=self.verify_ssl)
-                if get_response.status_code != 200:
-                    raise Exception(f"Failed to get dashboard config: {get_response.text}")
-                
-                dashboard_config = get_response.json()
-                
-                # Update the data view reference in the dashboard attributes
-                references = dashboard_config.get('references', [])
-                updated = False
-
-                for ref in references:
-                    if ref.get('type') == 'index-pattern' and ref.get('id') == source_data_view_id:
-                        ref['id'] = target_data_view_id
-                        updated = True
-
-                if updated:
-                  update_payload = {
-                      "attributes": dashboard_config['attributes'],
-                      "references": references
-                  }
-                
-                  update_response = requests.put(update_url, json=update_payload, 
-                                            auth=self.auth, headers=self.headers, 
-                                            verify=self.verify_ssl)
-                
-                  if update_response.status_code != 200:
-                    raise Exception(f"Failed to update dashboard: {update_response.text}")
+        # Data views carried by the bundle are now part of the target space
+        if any(item.get('type') == 'index-pattern' for item in import_result.get('successResults', [])):
+            self.invalidate_data_view_cache(target_space_id)
+            self.invalidate_inventory("dataviews")
+
+        return import_result
+
+    @instrumented
+    def find_saved_objects_by_origin(self, space_id, types, per_page=1000):
+        """
+        Read every saved object of the given types in a space, keyed by the object it was copied from
+
+        Kibana gives an imported object a new ID when its ID is already taken
+        in another space, and keeps the source ID as originId. Keying by
+        originId (or the ID for objects that kept theirs) lets a bundle
+        exported from the source space be matched against its copies.
+
+        Args:
+            space_id (str): Space to read from
+            types (iterable): Saved object types to read
+            per_page (int): Objects requested per page
+
+        Returns:
+            dict: Saved objects keyed by (type, originId or id)
+        """
+        types = sorted(set(types))
+        if not types:
+            return {}
+
+        url = f"{self.kibana_base_url}/s/{space_id}/api/saved_objects/_find"
+        found = {}
+        page = 1
+        while True:
+            params = {"type": types, "per_page": per_page, "page": page}
+            response = self._request('GET', url, params=params, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to read saved objects: {response.text}")
+
+            result = response.json()
+            for saved_object in result.get('saved_objects', []):
+                found[(saved_object['type'], saved_object.get('originId') or saved_object['id'])] = saved_object
+
+            if page * per_page >= result.get('total', 0):
+                return found
+            page += 1
+
+    def _changed_saved_objects(self, lines, target_space_id):
+        """
+        Compare the objects of a bundle with their copies in the target space
+
+        Returns:
+            tuple: (type, id) set of the new or changed objects, and the number of objects in the bundle
+        """
+        fingerprints = bundle_fingerprints(lines)
+        current = self.find_saved_objects_by_origin(target_space_id, {object_type for object_type, _ in fingerprints})
+        return changed_saved_objects(fingerprints, current), len(fingerprints)
+
+    @instrumented
+    def import_dashboard(self, export_content, target_space_id, source_data_view, target_data_view,
+                         skip_unchanged=True):
+        """
+        Import a dashboard into a specific space and update its data view
+
+        References to the source data view are rewritten in the NDJSON before
+        upload and the source data view itself is left out of the bundle, so the
+        import is a single request with no fix-up afterwards.
+
+        With skip_unchanged, the rewritten objects are fingerprinted and
+        compared with their copies in the target space, read with one _find; only new or
+        changed objects are uploaded, and nothing at all when the space is up
+        to date.
         
-        self.delete_data_view(target_space_id, source_data_view_id)
+        Args:
+            export_content (bytes|SavedObjectBundle): The exported dashboard content
+            target_space_id (str): Target space ID
+            source_data_view (str): Original data view ID/name
+            target_data_view (str): New data view ID/name to use
+            skip_unchanged (bool): Leave objects identical to the target ones out of the import
+        """
+        self.log(f"Importing dashboard to space {target_space_id} and updating data view from {source_data_view} to {target_data_view}", space=target_space_id)
+
+        if isinstance(export_content, SavedObjectBundle):
+            bundle = export_content
+        else:
+            bundle = SavedObjectBundle.from_content(export_content)
+
+        try:
+            lines = bundle.lines
+            source_data_view_id = find_data_view_id(bundle.lines(), source_data_view)
+            if source_data_view_id is not None:
+                target_data_view_id = self.get_data_view_id(target_space_id, target_data_view)
+                lines = lambda: rewrite_data_view_references(bundle.lines(), source_data_view_id, target_data_view_id)
+
+            unchanged = 0
+            if skip_unchanged:
+                try:
+                    changed, total = self._changed_saved_objects(lines(), target_space_id)
+                except Exception as e:
+                    # Fingerprinting only saves work; without it everything is imported
+                    self.log(f"Importing every object, comparing with space {target_space_id} failed: {e}",
+                             level=logging.WARNING, space=target_space_id)
+                else:
+                    unchanged = total - len(changed)
+                    if not changed:
+                        self.log(f"Dashboard already up to date in space {target_space_id}", space=target_space_id)
+                        return {"success": True, "successCount": 0, "unchanged": unchanged}
+                    if unchanged:
+                        source_lines = lines
+                        lines = lambda: select_saved_objects(source_lines(), changed)
+
+            import_result = self.import_saved_objects(lines, target_space_id)
+            import_result["unchanged"] = unchanged
+        finally:
+            if bundle is not export_content:
+                bundle.close()
+
+        if import_result.get('success') is False:
+            raise Exception(f"Import failed: {json.dumps(import_result.get('errors', []))}")
 
         return import_result
 
-    def get_data_view_id(self, space_id, data_view_name, headers):
+    @instrumented
+    def get_data_view_id(self, space_id, data_view_name, headers=None):
         """
         Fetch the data view ID for a given name in a specific space
+
+        Lookups are served from a per-space cache filled by a single list call
+        and expired after data_view_cache_ttl seconds. A name missing from a
+        fresh cache triggers one reload, in case it was created elsewhere.
+        """
+        data_view_ids = self._data_view_ids(space_id, headers)
+        data_view_id = data_view_ids.get(data_view_name)
+
+        if not data_view_id:
+            data_view_id = self._data_view_ids(space_id, headers, refresh=True).get(data_view_name)
+
+        if not data_view_id:
+            raise Exception(f"Source data view '{data_view_name}' not found in Kibana.")
+        return data_view_id
+
+    def _cached_inventory(self, kind, fetch, refresh=False):
+        """
+        Return a cached listing, fetching it when missing, expired or refresh is set
+
+        Error results are returned but never cached.
+        """
+        with self._inventory_cache_lock:
+            entry = self._inventory_cache.get(kind)
+        if not refresh and entry is not None and time.monotonic() - entry[0] <= self.inventory_cache_ttl:
+            return entry[1]
+
+        value = fetch()
+        if not (isinstance(value, dict) and value.get("status") == "error"):
+            with self._inventory_cache_lock:
+                self._inventory_cache[kind] = (time.monotonic(), value)
+        return value
+
+    def invalidate_inventory(self, *kinds):
+        """
+        Drop cached listings after a write
+
+        Args:
+            kinds (str): Listings to drop (spaces, roles, users, dataviews). Drops all if none given
+        """
+        with self._inventory_cache_lock:
+            if not kinds:
+                self._inventory_cache.clear()
+            for kind in kinds:
+                self._inventory_cache.pop(kind, None)
+
+    def _data_view_space_lock(self, space_id):
+        with self._data_view_cache_lock:
+            return self._data_view_space_locks.setdefault(space_id, threading.Lock())
+
+    def _data_view_ids(self, space_id, headers=None, refresh=False):
+        """
+        Return the cached data view name -> ID map of a space, reloading it when expired
         """
-        self.print_log(f"Fetching data view ID for {data_view_name} in space {space_id}")
+        with self._data_view_space_lock(space_id):
+            entry = self._data_view_cache.get(space_id)
+            if refresh or entry is None or time.monotonic() - entry[0] > self.data_view_cache_ttl:
+                entry = (time.monotonic(), self._fetch_data_view_ids(space_id, headers))
+                self._data_view_cache[space_id] = entry
+            return entry[1]
+
+    def _fetch_data_view_ids(self, space_id, headers=None):
+        self.log(f"Fetching data views of space {space_id}", level=logging.DEBUG, space=space_id)
 
         data_views_url = f"{self.kibana_base_url}/s/{space_id}/api/data_views"
     
-        response = requests.get(data_views_url, auth=self.auth, headers=headers, verify=self.verify_ssl)
+        response = self._request('GET', data_views_url, headers=headers or self.headers)
         if response.status_code != 200:
             raise Exception(f"Failed to fetch index patterns: {response.text}")
 
-        data_views = response.json().get('data_view', [])
-        data_view_id = None
+        data_view_ids = {}
+        for data_view in response.json().get('data_view', []):
+            # Keep the first match, as the former linear scan did
+            data_view_ids.setdefault(data_view.get('name'), data_view["id"])
+        return data_view_ids
 
-        for data_view in data_views:
-            if data_view.get('name') == data_view_name:
-                data_view_id = data_view["id"]
-                break
+    def _remember_data_view(self, space_id, data_view_name, data_view_id):
+        with self._data_view_space_lock(space_id):
+            entry = self._data_view_cache.get(space_id)
+            if entry is not None:
+                entry[1].setdefault(data_view_name, data_view_id)
 
-        if not data_view_id:
-            raise Exception(f"Source data view '{data_view_name}' not found in Kibana.")
-        return data_view_id
+    def _forget_data_view(self, space_id, data_view_id):
+        with self._data_view_space_lock(space_id):
+            entry = self._data_view_cache.get(space_id)
+            if entry is not None:
+                for name in [name for name, cached_id in entry[1].items() if cached_id == data_view_id]:
+                    del entry[1][name]
 
+    def invalidate_data_view_cache(self, space_id=None):
+        """
+        Drop the cached data views of one space, or of every space
+
+        Args:
+            space_id (str): Space to invalidate. If None, clears the whole cache
+        """
+        with self._data_view_cache_lock:
+            if space_id is None:
+                self._data_view_cache.clear()
+            else:
+                self._data_view_cache.pop(space_id, None)
+
+    @instrumented
     def copy_dashboard_between_spaces(self, dashboard_id, source_space_id, target_space_id, 
                                     source_data_view, target_data_view):
         """
@@ -369,147 +1163,1109 @@ class ElasticAutomation:
             source_data_view (str): Original data view ID/name
             target_data_view (str): New data view ID/name to use
         """
-        self.print_log(f"Copying dashboard {dashboard_id} from space {source_space_id} to {target_space_id} with data view update")
+        self.log(f"Copying dashboard {dashboard_id} from space {source_space_id} to {target_space_id} with data view update", space=target_space_id)
 
         try:
-            export_content = self.export_dashboard(dashboard_id, source_space_id)
-            
-            result = self.import_dashboard(export_content, target_space_id, 
-                                        source_data_view, target_data_view)
+            with self.export_dashboard_bundle(dashboard_id, source_space_id) as bundle:
+                result = self.import_dashboard(bundle, target_space_id, 
+                                            source_data_view, target_data_view)
             
             return result
         except Exception as e:
             raise Exception(f"Failed to copy dashboard: {str(e)}")    
-        
-    def copy_dashboards(self, config_id, client_id):
-        config_id = config_id
-        client_id = client_id
-        bi_client_name = f'client_{client_id}'
-        bi_space_id = f'{bi_client_name}_space'
-        bi_data_view_name = f'{bi_client_name}_data_view'
 
-        if not config_id:
-            return {"error": "No configuration selected"}
+    @instrumented
+    def fan_out_dashboards(self, dashboard_ids, targets, source_space_id='default',
+                           source_data_view=DEFAULT_SOURCE_DATA_VIEW, max_workers=4, templates=None):
+        """
+        Export each dashboard once and import the bundle into many target spaces
 
-        config = Configuration.query.get(config_id)
-        if not config:
-            return {"error": "Configuration not found"}
+        The exported NDJSON bundles are kept (and spooled to disk when large),
+        so the source space is exported once per dashboard no matter how many
+        targets there are. Dashboards found in templates are not exported at all.
 
-        dashboard_ids = [
-            "3a81edc6-40d2-435a-87a3-41ce352a523d",  # people_count_dashboard_id
-            "5b898e8b-12e9-4638-acf3-34fea03e7b61",  # people_count_area_dashboard_id
-            "e1f0588e-41fd-45b8-8160-e334b866f2f7"   # car_count_dashboard_id
-        ]
+        Args:
+            dashboard_ids (list): IDs of the dashboards to copy
+            targets (list): (target_space_id, target_data_view) pairs to import into
+            source_space_id (str): Space ID where the dashboards currently exist
+            source_data_view (str): Original data view name
+            max_workers (int): Maximum number of exports/imports running at the same time
+            templates (dict): Stored bundles keyed by dashboard ID, each a dict
+                with the NDJSON "bundle" and the "source_data_view" it was captured with
+
+        Returns:
+            dict: Overall status, success/error counts and one result per dashboard and target
+        """
+        self.log(f"Fanning out {len(dashboard_ids)} dashboards from space {source_space_id} to {len(targets)} spaces", space=source_space_id)
+
+        templates = templates or {}
+        source_data_views = {dashboard_id: templates[dashboard_id]["source_data_view"]
+                             for dashboard_id in dashboard_ids if dashboard_id in templates}
+
+        def export(dashboard_id):
+            try:
+                if dashboard_id in templates:
+                    return SavedObjectBundle.from_content(templates[dashboard_id]["bundle"])
+                return self.export_dashboard_bundle(dashboard_id, source_space_id)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
 
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            bundles = dict(zip(dashboard_ids, map_in_context(executor, export, dashboard_ids)))
+
+        def run(job):
+            dashboard_id, (target_space_id, target_data_view) = job
+            outcome = {"dashboard_id": dashboard_id, "target_space_id": target_space_id}
+            bundle = bundles[dashboard_id]
+            if not isinstance(bundle, SavedObjectBundle):
+                outcome.update(status="error", message=f"Failed to export dashboard: {bundle['message']}")
+                return outcome
+            try:
+                import_result = self.import_dashboard(bundle, target_space_id,
+                                                      source_data_views.get(dashboard_id, source_data_view),
+                                                      target_data_view)
+                if import_result.get("successCount", 0) == 0 and import_result.get("unchanged"):
+                    outcome.update(status="success", message="Dashboard already up to date")
+                else:
+                    outcome.update(status="success", message="Dashboard copied successfully")
+            except Exception as e:
+                outcome.update(status="error", message=f"Failed to copy dashboard: {str(e)}")
+            return outcome
+
+        jobs = [(dashboard_id, target) for target in targets for dashboard_id in dashboard_ids]
         try:
-          for source_dashboard_id in dashboard_ids:
-              self.copy_dashboard_between_spaces(
-                  dashboard_id=source_dashboard_id,
-                  source_space_id="default",
-                  target_space_id=bi_space_id,
-                  source_data_view="DGuard Demo",
-                  target_data_view=bi_data_view_name
-              )
-        except Exception as e:
-            raise Exception(f"Failed to copy dashboard: {str(e)}")    
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(map_in_context(executor, run, jobs))
+        finally:
+            for bundle in bundles.values():
+                if isinstance(bundle, SavedObjectBundle):
+                    bundle.close()
+
+        return summarize_results(results, "Dashboards copied successfully", "Failed to copy dashboards")
+
+    def find_saved_objects(self, space_id, types, per_page=1000):
+        """
+        Page through the saved objects of a space with _find
+
+        Args:
+            space_id (str): Space to search
+            types (iterable): Saved object types to include
+            per_page (int): Objects requested per page
+
+        Yields:
+            dict: {"type": ..., "id": ...} of every object found
+        """
+        url = f"{self.kibana_base_url}/s/{space_id}/api/saved_objects/_find"
+        page = 1
+        while True:
+            params = {"type": list(types), "per_page": per_page, "page": page, "fields": "title"}
+            response = self._request('GET', url, params=params, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to find saved objects: {response.text}")
+
+            result = response.json()
+            for saved_object in result.get('saved_objects', []):
+                yield {"type": saved_object["type"], "id": saved_object["id"]}
+
+            if page * per_page >= result.get('total', 0):
+                return
+            page += 1
+
+    @instrumented
+    def count_saved_objects(self, space_id, types):
+        """
+        Count the saved objects of each type in a space
+
+        Returns:
+            dict: Number of objects keyed by type
+        """
+        url = f"{self.kibana_base_url}/s/{space_id}/api/saved_objects/_find"
+        counts = {}
+        for saved_object_type in types:
+            response = self._request('GET', url, params={"type": saved_object_type, "per_page": 0}, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to count saved objects: {response.text}")
+            counts[saved_object_type] = response.json().get('total', 0)
+        return counts
+
+    @instrumented
+    def migrate_space(self, source_space_id, target_space_id, types=MIGRATION_TYPES, data_view_mapping=None,
+                      export_chunk_size=500, max_chunk_bytes=MAX_IMPORT_PAYLOAD_BYTES, max_workers=4,
+                      chunk_retries=2, on_chunk=None):
+        """
+        Copy every saved object of the given types from one space to another
+
+        Objects are discovered page by page with _find, exported in chunks of
+        export_chunk_size and re-split into import chunks below
+        max_chunk_bytes. Import chunks run in parallel, one type tier at a time
+        (data views, then searches, then visualizations, then dashboards), so
+        references exist before the objects pointing at them. Requests are
+        retried by _request per the client's retry policy; on top of that, an
+        import chunk that still fails, or comes back with success false, is
+        sent again up to chunk_retries times with backoff. _request never
+        resends a POST whose connection dropped, but an overwrite import is
+        idempotent and its chunk can be read again.
+
+        Args:
+            source_space_id (str): Space to copy from
+            target_space_id (str): Space to copy into
+            types (iterable): Saved object types to copy
+            data_view_mapping (dict): Target data view name keyed by source data view
+                name. Mapped source data views are not copied, references to
+                them are rewritten to the target data view.
+            export_chunk_size (int): Objects per export request
+            max_chunk_bytes (int): Maximum NDJSON bytes per import request
+            max_workers (int): Maximum number of chunks in flight at the same time
+            chunk_retries (int): Further attempts of a failed import chunk
+            on_chunk (callable): Called with (name, result) as each import chunk finishes
 
-        return {"status": "success", "message": "Dashboards copied successfully"}
+        Returns:
+            dict: Overall status, per-chunk results and a per-type reconciliation
+                of the objects sent against the objects found in the target space
+        """
+        types = tuple(types)
+        self.log(f"Migrating {', '.join(types)} from space {source_space_id} to {target_space_id}", space=target_space_id)
+
+        mapping = []
+        for source_data_view, target_data_view in (data_view_mapping or {}).items():
+            mapping.append((self.get_data_view_id(source_space_id, source_data_view),
+                            self.get_data_view_id(target_space_id, target_data_view)))
+
+        discovered = list(self.find_saved_objects(source_space_id, types))
+        tiers = [tuple(t for t in tier if t in types) for tier in MIGRATION_TYPE_TIERS]
+        tiers += [tuple(t for t in types if t not in MIGRATION_TYPES)]
+
+        def export(objects):
+            payload = {"objects": objects, "includeReferencesDeep": False, "excludeExportDetails": True}
+            try:
+                return self.export_saved_objects(payload, source_space_id)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+
+        def import_chunk(job):
+            name, chunk = job
+            outcome = {"chunk": name, "objects": chunk.count}
+            try:
+                for attempt in range(chunk_retries + 1):
+                    try:
+                        import_result = self.import_saved_objects(chunk.lines, target_space_id)
+                    except Exception as e:
+                        outcome.update(status="error", imported=0, message=str(e))
+                    else:
+                        outcome.pop("message", None)
+                        outcome.update(status="success" if import_result.get('success', True) else "error",
+                                       imported=import_result.get('successCount', 0),
+                                       errors=import_result.get('errors', []))
+                    outcome["attempts"] = attempt + 1
+                    if outcome["status"] == "success" or attempt == chunk_retries:
+                        break
+                    self.log(f"Import chunk {name} failed, sending it again", level=logging.WARNING,
+                             space=target_space_id)
+                    time.sleep(self.retry_policy.delay(attempt))
+            finally:
+                chunk.close()
+            if on_chunk:
+                on_chunk(name, outcome)
+            return outcome
+
+        sent = {saved_object_type: 0 for saved_object_type in types}
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for tier in tiers:
+                objects = [saved_object for saved_object in discovered if saved_object["type"] in tier]
+                if not objects:
+                    continue
+
+                export_chunks = [objects[start:start + export_chunk_size]
+                                 for start in range(0, len(objects), export_chunk_size)]
+                import_chunks = []
+                for index, bundle in enumerate(map_in_context(executor, export, export_chunks)):
+                    if not isinstance(bundle, SavedObjectBundle):
+                        results.append({"chunk": f"{'/'.join(tier)}-{index}-export", "objects": len(export_chunks[index]),
+                                        "status": "error", "imported": 0, "message": bundle["message"]})
+                        continue
+                    with bundle:
+                        lines = bundle.lines()
+                        for source_data_view_id, target_data_view_id in mapping:
+                            lines = rewrite_data_view_references(lines, source_data_view_id, target_data_view_id)
+
+                        chunk = None
+                        for line in lines:
+                            line = line.rstrip(b"\n")
+                            if chunk is None or chunk.size + len(line) + 1 > max_chunk_bytes:
+                                chunk = SavedObjectBundle()
+                                import_chunks.append((f"{'/'.join(tier)}-{index}-{len(import_chunks)}", chunk))
+                            chunk.append(line)
+                            sent[json.loads(line)["type"]] += 1
+
+                results.extend(map_in_context(executor, import_chunk, import_chunks))
+
+        source_counts = self.count_saved_objects(source_space_id, types)
+        target_counts = self.count_saved_objects(target_space_id, types)
+        reconciliation = {
+            saved_object_type: {
+                "source": source_counts[saved_object_type],
+                "sent": sent[saved_object_type],
+                "target": target_counts[saved_object_type],
+                "complete": target_counts[saved_object_type] >= sent[saved_object_type]
+            }
+            for saved_object_type in types
+        }
+
+        summary = summarize_results(results, "Space migrated successfully", "Failed to migrate space")
+        if summary["status"] == "success" and not all(entry["complete"] for entry in reconciliation.values()):
+            summary.update(status="partial", message="Space migrated, but the target is missing objects")
+        summary.update(discovered=len(discovered), reconciliation=reconciliation)
+        return summary
+
+    @instrumented
+    def copy_dashboards(self, config_id, client_id, dashboard_ids=None, max_workers=4):
+        """
+        Copy the tenant dashboards into the space of one or many clients
+
+        With a template store and a configuration, the dashboards captured
+        for that configuration are copied from the store; dashboards without a
+        template are exported live from the default space.
+
+        Args:
+            config_id (int): ID of the configuration in use, if any
+            client_id (int|list): Client ID, or a list of client IDs to fan out to
+            dashboard_ids (list): Dashboards to copy, defaults to the templates of
+                the configuration, or DEFAULT_DASHBOARD_IDS when it has none
+            max_workers (int): Maximum number of exports/imports running at the same time
+        """
+        client_ids = client_id if isinstance(client_id, (list, tuple)) else [client_id]
+        targets = [(f'client_{client_id}_space', f'client_{client_id}_data_view') for client_id in client_ids]
+
+        templates = {}
+        if self.template_store is not None and config_id:
+            templates = self.template_store.latest(config_id, dashboard_ids)
+
+        return self.fan_out_dashboards(dashboard_ids or list(templates) or DEFAULT_DASHBOARD_IDS, targets,
+                                       source_space_id="default",
+                                       source_data_view=DEFAULT_SOURCE_DATA_VIEW,
+                                       max_workers=max_workers,
+                                       templates=templates)
     
+    @instrumented
     def delete_data_view(self, space_id, data_view_id):
-        self.print_log(f"Deleting data view {data_view_id} from space {space_id}")
+        self.log(f"Deleting data view {data_view_id} from space {space_id}", space=space_id)
         
         url = f"{self.kibana_base_url}/s/{space_id}/api/saved_objects/index-pattern/{data_view_id}"
         
         headers = {"kbn-xsrf": "true"}
 
-        response = requests.delete(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('DELETE', url, headers=headers)
+        self.invalidate_inventory("dataviews")
         if response.status_code == 200:
+            self._forget_data_view(space_id, data_view_id)
             return {"status": "success", "message": "Data View deleted successfully"}
         else:
             return {"status": "error", "message": response.text}
         
-    def print_log(self, message):
-        print("\n" + "*" * (len(message) + 8))
-        print(f"*   {message}   *")
-        print("*" * (len(message) + 8) + "\n")
+    def log(self, message, level=logging.INFO, **fields):
+        """
+        Log a structured record tagged with the running operation
 
-    def get_spaces(self):
+        Args:
+            message (str): What is happening
+            level (int): Logging level
+            **fields: Extra record fields, such as space or client_id
         """
-        Fetch all Kibana spaces.
+        if logger.isEnabledFor(level):
+            logger.log(level, message, extra={"fields": {"operation": current_operation(), **fields}})
+
+    @instrumented
+    def get_spaces(self, refresh=False):
+        """
+        Fetch all Kibana spaces, served from the inventory cache unless refresh is set.
         """
+        return self._cached_inventory("spaces", self._fetch_spaces, refresh)
+
+    def _fetch_spaces(self):
         url = f"{self.kibana_base_url}/api/spaces/space?include_authorized_purposes=true"
         headers = {
             "kbn-xsrf": "true"
         }
 
         
-        response = requests.get(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=headers)
         if response.status_code == 200:
             return response.json()
         else:
             return {"status": "error", "message": response.text}
 
-    def get_roles(self):
+    @instrumented
+    def get_roles(self, refresh=False):
         """
-        Fetch all Kibana roles.
+        Fetch all Kibana roles, served from the inventory cache unless refresh is set.
         """
+        return self._cached_inventory("roles", self._fetch_roles, refresh)
+
+    def _fetch_roles(self):
         url = f"{self.kibana_base_url}/api/security/role"
         headers = {
             "kbn-xsrf": "true"
         }
 
         
-        response = requests.get(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=headers)
         if response.status_code == 200:
             return response.json()
         else:
             return {"status": "error", "message": response.text}
         
-    def get_users(self):
+    @instrumented
+    def get_users(self, refresh=False):
         """
-        Fetch all Elastic users.
+        Fetch all Elastic users, served from the inventory cache unless refresh is set.
         """
+        return self._cached_inventory("users", self._fetch_users, refresh)
+
+    def _fetch_users(self):
         url = f"{self.elastic_base_url}/_security/user"
         headers = {
             "kbn-xsrf": "true"
         }
         
-        response = requests.get(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=headers)
         if response.status_code == 200:
             users = response.json()
             return users
         else:
             return {"status": "error", "message": response.text}
         
-    def get_dataviews(self):
+    @instrumented
+    def get_dataviews(self, refresh=False):
         """
-        Fetch all Kibana dataviews.
+        Fetch all Kibana dataviews, served from the inventory cache unless refresh is set.
         """
+        return self._cached_inventory("dataviews", self._fetch_dataviews, refresh)
+
+    def _fetch_dataviews(self):
         url = f"{self.kibana_base_url}/api/data_views"
         headers = {
             "kbn-xsrf": "true"
         }
 
         
-        response = requests.get(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('GET', url, headers=headers)
         if response.status_code == 200:
             return response.json()
         else:
             raise Exception(f"Failed to fetch dataviews: {response.text}")
         
+    @instrumented
     def delete_space(self, space_id):
         """
-        Delete a space by id
+        Delete a space by id, with everything saved in it
+
+        A space that does not exist counts as deleted.
         """
-        self.print_log(f"Deleting space: {space_id}")
+        self.log(f"Deleting space: {space_id}", space=space_id)
 
         url = f"{self.kibana_base_url}/api/spaces/space/{space_id}"
         
         headers = {"kbn-xsrf": "true"}
 
-        response = requests.delete(url, headers=headers, auth=self.auth, verify=self.verify_ssl)
+        response = self._request('DELETE', url, headers=headers)
+        self.invalidate_data_view_cache(space_id)
+        self.invalidate_inventory("spaces", "dataviews")
         
+        if response.status_code in (200, 204):
+            return {"status": "success", "message": "Space deleted successfully"}
+        elif response.status_code == 404:
+            return {"status": "success", "message": "Space not found, nothing to delete"}
+        else:
+            return {"status": "error", "message": response.text}
+
+    @instrumented
+    def delete_role(self, role_name):
+        """
+        Delete a role; a role that does not exist counts as deleted
+
+        Args:
+            role_name (str): Role name to delete
+        """
+        self.log(f"Deleting role {role_name}")
+
+        url = f"{self.elastic_base_url}/_security/role/{role_name}"
+        response = self._request('DELETE', url, headers=self.headers)
+        self.invalidate_inventory("roles")
+
         if response.status_code == 200:
-            return {"status": "success", "message": "Data View deleted successfully"}
+            return {"status": "success", "message": "Role deleted successfully"}
+        elif response.status_code == 404:
+            return {"status": "success", "message": "Role not found, nothing to delete"}
+        else:
+            return {"status": "error", "message": response.text}
+
+    @instrumented
+    def delete_user(self, username):
+        """
+        Delete a user; a user that does not exist counts as deleted
+
+        Args:
+            username (str): Username to delete
+        """
+        self.log(f"Deleting user {username}")
+
+        url = f"{self.elastic_base_url}/_security/user/{username}"
+        response = self._request('DELETE', url, headers=self.headers)
+        self.invalidate_inventory("users")
+
+        if response.status_code == 200:
+            return {"status": "success", "message": "User deleted successfully"}
+        elif response.status_code == 404:
+            return {"status": "success", "message": "User not found, nothing to delete"}
+        else:
+            return {"status": "error", "message": response.text}
+
+    @instrumented
+    def remove_index_aliases(self, aliases, chunk_size=500):
+        """
+        Remove many aliases from every index with one atomic _aliases request per chunk
+
+        Missing aliases are ignored (must_exist false), so a teardown can be rerun.
+
+        Args:
+            aliases (dict): Alias name to remove, keyed by client ID
+            chunk_size (int): Maximum number of remove actions per request
+
+        Returns:
+            list: One result per alias, in the order given
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        items = list(aliases.items())
+        self.log(f"Removing {len(items)} aliases in chunks of {chunk_size}")
+
+        url = f"{self.elastic_base_url}/_aliases"
+        results = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            payload = {
+                "actions": [{"remove": {"index": "*", "alias": alias_name, "must_exist": False}}
+                            for _, alias_name in chunk]
+            }
+            response = self._request('POST', url, json=payload)
+
+            if response.status_code == 200:
+                status, message = "success", "Alias removed successfully"
+            else:
+                status, message = "error", response.text
+
+            for client_id, alias_name in chunk:
+                results.append({"client_id": client_id, "alias": alias_name, "status": status, "message": message})
+
+        return results
+
+    @instrumented
+    def teardown_tenants(self, client_ids, steps=None, max_workers=8, journal=None, config_id=None):
+        """
+        Remove the client_<id> alias, user, role and space of many tenants
+
+        Aliases of all tenants are removed in bulk; the user, role and space
+        deletes of every tenant then run concurrently, at most max_workers at
+        a time. Artifacts that are already gone count as removed. The journal
+        entries of the onboarding steps whose artifacts were removed are
+        dropped, so onboarding the tenant again with resume recreates them.
+
+        Args:
+            client_ids (list): Client IDs of the tenants to remove
+            steps (iterable): Names from TEARDOWN_STEPS to run, all of them by default
+            max_workers (int): Maximum number of deletes running at the same time
+            journal (JournalWriter): Step journal of the onboarding runs
+            config_id (int): Configuration the tenants were onboarded with
+
+        Returns:
+            dict: Overall status and, per tenant, the result of every step
+        """
+        steps = [name for name in TEARDOWN_STEPS if steps is None or name in steps]
+        self.log(f"Tearing down {len(client_ids)} tenants: {', '.join(steps)}")
+
+        results = {client_id: {} for client_id in client_ids}
+        if "remove_index_alias" in steps and client_ids:
+            for result in self.remove_index_aliases({client_id: f'client_{client_id}_alias' for client_id in client_ids}):
+                results[result["client_id"]]["remove_index_alias"] = {"status": result["status"], "message": result["message"]}
+
+        deletes = {
+            "delete_user": lambda client_id: self.delete_user(f'client_{client_id}'),
+            "delete_role": lambda client_id: self.delete_role(f'client_{client_id}_role'),
+            "delete_space": lambda client_id: self.delete_space(f'client_{client_id}_space'),
+        }
+
+        def run(client_id, name):
+            try:
+                return deletes[name](client_id)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                (client_id, name): executor.submit(contextvars.copy_context().run, run, client_id, name)
+                for client_id in client_ids for name in steps if name in deletes
+            }
+            for (client_id, name), future in futures.items():
+                results[client_id][name] = future.result()
+
+        tenants = []
+        for client_id in client_ids:
+            operations = [{"operation": name, "result": results[client_id][name]}
+                          for name in steps if name in results[client_id]]
+            failed = any(step_failed(operation["result"]) for operation in operations)
+            tenants.append({"client_id": client_id, "status": "error" if failed else "success", "results": operations})
+
+        if journal is not None:
+            journal.forget(config_id, {
+                client_id: [undone for name, result in results[client_id].items() if not step_failed(result)
+                            for undone in TEARDOWN_UNDOES[name]]
+                for client_id in client_ids
+            })
+
+        return summarize_results(tenants, "Tenants removed successfully", "Failed to remove tenants")
+
+    @instrumented
+    def fetch_inventory(self, per_page=1000, max_window=MAX_FIND_WINDOW):
+        """
+        Fetch the current aliases, roles, users, spaces and data views with one bulk read each
+
+        Data views are paged with _find, which cannot go past max_window
+        results. When there are more, the spaces are split in halves and each
+        half is read on its own; a single space holding more than max_window
+        data views fails the inventory.
+
+        Args:
+            per_page (int): Data views requested per _find page
+            max_window (int): Largest page * per_page Kibana accepts
+
+        Returns:
+            dict: aliases ({alias: {index: alias definition}}), roles, users,
+                spaces ({space_id: space}) and data_views ({(space_id, name): data view})
+        """
+        self.log("Fetching tenant inventory")
+
+        def get(url, params=None):
+            response = self._request('GET', url, params=params, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch inventory from {url}: {response.text}")
+            return response.json()
+
+        aliases = {}
+        for index, entry in get(f"{self.elastic_base_url}/_alias").items():
+            for alias_name, definition in entry.get('aliases', {}).items():
+                aliases.setdefault(alias_name, {})[index] = definition
+
+        spaces = {space['id']: space for space in get(f"{self.kibana_base_url}/api/spaces/space")}
+
+        data_views = {}
+        url = f"{self.kibana_base_url}/api/saved_objects/_find"
+        # A page size dividing the window lets the last page end right on it
+        page_size = next(size for size in range(min(per_page, max_window), 0, -1) if max_window % size == 0)
+
+        def find_data_views(namespaces):
+            page = 1
+            while True:
+                params = {"type": "index-pattern", "namespaces": namespaces, "fields": ["title", "name"],
+                          "per_page": page_size, "page": page}
+                result = get(url, params)
+                total = result.get('total', 0)
+                if page == 1 and total > max_window:
+                    space_ids = sorted(spaces) if namespaces == ["*"] else namespaces
+                    if len(space_ids) < 2:
+                        raise Exception(f"Space {space_ids[0]} has {total} data views, more than the "
+                                        f"{max_window} a _find can page through")
+                    half = len(space_ids) // 2
+                    find_data_views(space_ids[:half])
+                    find_data_views(space_ids[half:])
+                    return
+
+                for saved_object in result.get('saved_objects', []):
+                    attributes = saved_object.get('attributes', {})
+                    for space_id in saved_object.get('namespaces', ['default']):
+                        data_views[(space_id, attributes.get('name') or attributes.get('title'))] = {
+                            "id": saved_object['id'], "title": attributes.get('title')
+                        }
+                if page * page_size >= total:
+                    return
+                page += 1
+
+        find_data_views(["*"])
+
+        return {
+            "aliases": aliases,
+            "roles": get(f"{self.elastic_base_url}/_security/role"),
+            "users": get(f"{self.elastic_base_url}/_security/user"),
+            "spaces": spaces,
+            "data_views": data_views
+        }
+
+    @instrumented
+    def fetch_tenant_inventory(self, client_id):
+        """
+        Fetch the current state of one tenant with one read per artifact name
+
+        The alias, role, user and space are read by name and the data views
+        from the tenant space only, so reconciling a single tenant does not
+        download the inventory of the whole cluster.
+
+        Args:
+            client_id (int): Client ID of the tenant
+
+        Returns:
+            dict: Same shape as fetch_inventory, holding only the tenant's artifacts that exist
+        """
+        bi_client_name = f'client_{client_id}'
+        bi_role_name = f'{bi_client_name}_role'
+        bi_space_id = f'{bi_client_name}_space'
+        self.log(f"Fetching inventory of tenant {client_id}", client_id=client_id)
+
+        def get(url):
+            response = self._request('GET', url, headers=self.headers)
+            if response.status_code == 404:
+                return None
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch inventory from {url}: {response.text}")
+            return response.json()
+
+        aliases = {}
+        for index, entry in (get(f"{self.elastic_base_url}/_alias/{bi_client_name}_alias") or {}).items():
+            for alias_name, definition in entry.get('aliases', {}).items():
+                aliases.setdefault(alias_name, {})[index] = definition
+
+        space = get(f"{self.kibana_base_url}/api/spaces/space/{bi_space_id}")
+        data_views = {}
+        if space is not None:
+            for name, data_view_id in self._data_view_ids(bi_space_id, refresh=True).items():
+                data_views[(bi_space_id, name)] = {"id": data_view_id}
+
+        return {
+            "aliases": aliases,
+            "roles": get(f"{self.elastic_base_url}/_security/role/{bi_role_name}") or {},
+            "users": get(f"{self.elastic_base_url}/_security/user/{bi_client_name}") or {},
+            "spaces": {bi_space_id: space} if space is not None else {},
+            "data_views": data_views
+        }
+
+    @instrumented
+    def reconcile_tenants(self, tenants, index_pattern, steps=None, dry_run=False, config_id=None, max_workers=4):
+        """
+        Bring tenants to their desired state, issuing only the missing or changed operations
+
+        Current state comes from fetch_inventory (five bulk reads in total), or
+        from fetch_tenant_inventory when a single tenant is reconciled. Missing
+        aliases of all tenants are created in bulk, the other planned steps run
+        per tenant through onboard_tenant.
+
+        Args:
+            tenants (list): Client IDs, or dicts with client_id and optional space_name
+            index_pattern (str): Index pattern the tenant aliases filter
+            steps (iterable): Names from TENANT_STEPS to run, RECONCILED_STEPS when None.
+                An empty list runs nothing. Steps outside RECONCILED_STEPS (copy_dashboards) cannot be diffed and always run.
+            dry_run (bool): Only return the plan
+            config_id (int): Configuration in use
+            max_workers (int): Maximum number of tenants processed at the same time
+
+        Returns:
+            dict: Overall status and, per tenant, its plan and the results of the applied steps
+        """
+        steps = set(RECONCILED_STEPS if steps is None else steps)
+        tenants = [tenant if isinstance(tenant, dict) else {"client_id": tenant} for tenant in tenants]
+        if len(tenants) == 1:
+            inventory = self.fetch_tenant_inventory(tenants[0]["client_id"])
         else:
-                return {"status": "error", "message": response.text}
+            inventory = self.fetch_inventory()
+
+        plans = []
+        for tenant in tenants:
+            plans.append({
+                "client_id": tenant["client_id"],
+                "space_name": tenant.get("space_name") or f'client_{tenant["client_id"]} Space',
+                "plan": plan_tenant(tenant["client_id"], index_pattern, inventory, steps)
+            })
+
+        if dry_run:
+            return {"status": "success", "message": "Plan computed", "tenants": plans}
+
+        missing_aliases = {
+            plan["client_id"]: f'client_{plan["client_id"]}_alias'
+            for plan in plans
+            if any(step["operation"] == "create_index_alias" for step in plan["plan"])
+        }
+        alias_results = {}
+        if missing_aliases:
+            for result in self.create_index_aliases(index_pattern, missing_aliases):
+                alias_results[result["client_id"]] = {"status": result["status"], "message": result["message"]}
+
+        def apply(plan):
+            planned = {step["operation"] for step in plan["plan"]} - {"create_index_alias"}
+            planned |= steps - set(RECONCILED_STEPS)
+            operations = onboard_tenant(self, plan["client_id"], index_pattern, plan["space_name"], planned,
+                                        config_id=config_id)
+            if plan["client_id"] in alias_results:
+                operations.insert(0, {"operation": "create_index_alias", "result": alias_results[plan["client_id"]]})
+            return dict(plan, results=operations)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            applied = list(map_in_context(executor, apply, plans))
+
+        results = [{"status": "error" if any(step_failed(operation["result"]) for operation in tenant["results"]) else "success"}
+                   for tenant in applied]
+        summary = summarize_results(results, "Tenants reconciled successfully", "Failed to reconcile tenants")
+        summary["results"] = applied
+        return summary
+
+
+# Steps whose current state reconcile_tenants can read in bulk
+RECONCILED_STEPS = ("create_index_alias", "create_space", "create_role", "create_user", "create_data_view")
+
+def plan_tenant(client_id, index_pattern, inventory, steps=RECONCILED_STEPS):
+    """
+    Diff the desired state of a tenant against the inventory
+
+    Args:
+        client_id (int): Client ID of the tenant
+        index_pattern (str): Index pattern the tenant alias filters
+        inventory (dict): Current state, as returned by ElasticAutomation.fetch_inventory
+        steps (iterable): Steps to check
+
+    Returns:
+        list: {"operation": name, "reason": "missing" | "changed"} per step to run
+    """
+    bi_client_name = f'client_{client_id}'
+    bi_role_name = f'{bi_client_name}_role'
+    bi_alias_name = f'{bi_client_name}_alias'
+    bi_space_id = f'{bi_client_name}_space'
+    bi_data_view_name = f'{bi_client_name}_data_view'
+
+    plan = []
+
+    def add(operation, reason):
+        if operation in steps:
+            plan.append({"operation": operation, "reason": reason})
+
+    alias = inventory["aliases"].get(bi_alias_name)
+    if not alias:
+        add("create_index_alias", "missing")
+    else:
+        expected_filter = alias_add_action(index_pattern, bi_alias_name, client_id)["add"]["filter"]
+        matching = [index for index in alias if fnmatch.fnmatch(index, index_pattern)]
+        if not matching:
+            add("create_index_alias", "missing")
+        elif any(json.dumps(alias[index].get("filter"), sort_keys=True, default=str)
+                 != json.dumps(expected_filter, sort_keys=True, default=str) for index in matching):
+            add("create_index_alias", "changed")
+
+    if bi_space_id not in inventory["spaces"]:
+        add("create_space", "missing")
+
+    role = inventory["roles"].get(bi_role_name)
+    if role is None:
+        add("create_role", "missing")
+    else:
+        expected = role_payload(bi_alias_name, bi_space_id)
+        indices = [
+            {"names": index.get("names") if isinstance(index.get("names"), list) else [index.get("names")],
+             "privileges": sorted(index.get("privileges", []))}
+            for index in role.get("indices", [])
+        ]
+        expected_indices = [{"names": [bi_alias_name], "privileges": sorted(expected["indices"][0]["privileges"])}]
+        applications = [
+            {key: application.get(key) for key in ("application", "privileges", "resources")}
+            for application in role.get("applications", [])
+        ]
+        if indices != expected_indices or applications != expected["applications"]:
+            add("create_role", "changed")
+
+    user = inventory["users"].get(bi_client_name)
+    if user is None:
+        add("create_user", "missing")
+    elif bi_role_name not in user.get("roles", []):
+        add("create_user", "changed")
+
+    if (bi_space_id, bi_data_view_name) not in inventory["data_views"]:
+        add("create_data_view", "missing")
+
+    return plan
+
+# Onboarding steps of a tenant and the steps each one has to wait for
+TENANT_STEPS = [
+    ("create_index_alias", ()),
+    ("create_space", ()),
+    ("create_role", ()),
+    ("create_user", ("create_role",)),
+    ("create_data_view", ("create_index_alias", "create_space")),
+    ("copy_dashboards", ("create_data_view",)),
+]
+
+# Teardown steps of a tenant; the alias goes first, in bulk, the rest run concurrently
+TEARDOWN_STEPS = ("remove_index_alias", "delete_user", "delete_role", "delete_space")
+
+# Onboarding steps whose artifacts each teardown step removes; the space takes its data view and dashboards along
+TEARDOWN_UNDOES = {
+    "remove_index_alias": ("create_index_alias",),
+    "delete_user": ("create_user",),
+    "delete_role": ("create_role",),
+    "delete_space": ("create_space", "create_data_view", "copy_dashboards"),
+}
+
+def step_failed(result):
+    return isinstance(result, dict) and (result.get("status") == "error" or "error" in result)
+
+class StepScheduler:
+    """
+    Run named steps concurrently as soon as the steps they depend on have succeeded
+
+    Steps are declared in order with add(). A step whose dependency failed or
+    was skipped is skipped as well. Dependencies on steps that were never added
+    are ignored, so optional steps can be left out of a plan.
+    """
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._steps = []
+
+    def add(self, name, func, depends_on=()):
+        """
+        Declare a step
+
+        Args:
+            name (str): Operation name reported in the results
+            func (callable): Called without arguments to run the step
+            depends_on (tuple): Names of the steps that must succeed first
+        """
+        self._steps.append((name, func, tuple(depends_on)))
+
+    def run(self, on_step=None):
+        """
+        Run every declared step
+
+        Args:
+            on_step (callable): Called with (name, result) as each step finishes or is skipped
+
+        Returns:
+            list: {"operation": name, "result": result} per step, in declaration order
+        """
+        names = {name for name, _, _ in self._steps}
+        pending = {name: (func, [dep for dep in depends_on if dep in names]) for name, func, depends_on in self._steps}
+        results = {}
+        failed = set()
+
+        def call(func):
+            try:
+                return func()
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    blocked = [dep for dep in depends_on if dep in failed]
+                    if blocked:
+                        results[name] = {"status": "skipped", "message": f"Skipped because {', '.join(blocked)} did not succeed"}
+                        failed.add(name)
+                        del pending[name]
+                        if on_step:
+                            on_step(name, results[name])
+                    elif all(dep in results for dep in depends_on):
+                        # Each step runs with the log context of the caller
+                        running[executor.submit(contextvars.copy_context().run, call, func)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if step_failed(results[name]):
+                        failed.add(name)
+                    if on_step:
+                        on_step(name, results[name])
+
+        return [{"operation": name, "result": results[name]} for name, _, _ in self._steps]
+
+def onboard_tenant(automation, client_id, index_pattern, space_name, steps, config_id=None, max_workers=4,
+                   on_step=None, dashboard_ids=None, journal=None, completed=()):
+    """
+    Run the selected onboarding steps of a tenant, independent steps in parallel
+
+    Args:
+        automation (ElasticAutomation): Client to run the steps with
+        client_id (int): Client ID of the tenant
+        index_pattern (str): Index pattern the tenant alias filters
+        space_name (str): Display name of the tenant space
+        steps (iterable): Names from TENANT_STEPS to run
+        config_id (int): Configuration in use, if any
+        max_workers (int): Maximum number of steps running at the same time
+        on_step (callable): Called with (name, result) as each step finishes or is skipped
+        dashboard_ids (list): Dashboards copied by copy_dashboards, defaults to DEFAULT_DASHBOARD_IDS
+        journal (JournalWriter): Records the status, timing and result of every step
+        completed (set): Steps finished by an earlier run, reported without running them again
+
+    Returns:
+        list: {"operation": name, "result": result} per selected step, in TENANT_STEPS order
+    """
+    bi_client_name = f'client_{client_id}'
+    bi_role_name = f'{bi_client_name}_role'
+    bi_alias_name = f'{bi_client_name}_alias'
+    bi_space_id = f'{bi_client_name}_space'
+    bi_data_view_name = f'{bi_client_name}_data_view'
+
+    actions = {
+        "create_index_alias": lambda: automation.create_index_alias(index_pattern, bi_alias_name, client_id),
+        "create_space": lambda: automation.create_space(bi_space_id, name=space_name, description="Space for events analysis"),
+        "create_role": lambda: automation.create_role(role_name=bi_role_name, indice=bi_alias_name, space=bi_space_id),
+        "create_user": lambda: automation.create_user(username=bi_client_name, password=bi_client_name, roles=[bi_role_name]),
+        "create_data_view": lambda: automation.create_data_view(space_id=bi_space_id, dataview_name=bi_data_view_name, index_pattern=bi_alias_name),
+        "copy_dashboards": lambda: automation.copy_dashboards(config_id=config_id, client_id=client_id,
+                                                              dashboard_ids=dashboard_ids),
+    }
+
+    def journaled(name, action):
+        def run():
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            try:
+                result = action()
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            journal.record(config_id, client_id, name, "error" if step_failed(result) else "success",
+                           started_at=started_at, duration=time.perf_counter() - started, response=result)
+            return result
+        return run
+
+    def step_done(name, result):
+        if journal is not None and isinstance(result, dict) and result.get("status") == "skipped":
+            journal.record(config_id, client_id, name, "skipped", response=result)
+        if on_step:
+            on_step(name, result)
+
+    steps = set(steps)
+    completed = steps & set(completed)
+    scheduler = StepScheduler(max_workers=max_workers)
+    for name, depends_on in TENANT_STEPS:
+        if name in steps and name not in completed:
+            if journal is not None:
+                journal.record(config_id, client_id, name, "pending")
+                scheduler.add(name, journaled(name, actions[name]), depends_on)
+            else:
+                scheduler.add(name, actions[name], depends_on)
+    with log_context(client_id=client_id, space=bi_space_id):
+        results = {operation["operation"]: operation["result"] for operation in scheduler.run(on_step=step_done)}
+
+    for name, _ in TENANT_STEPS:
+        if name in completed:
+            results[name] = {"status": "success", "message": "Completed in an earlier run"}
+            if on_step:
+                on_step(name, results[name])
+    return [{"operation": name, "result": results[name]} for name, _ in TENANT_STEPS if name in results]
+
+class ClientRegistry:
+    """
+    Process-wide registry of warm ElasticAutomation clients keyed by Configuration.config_id
+
+    Clients keep their pooled connections between requests. Entries must be
+    invalidated whenever the underlying Configuration row changes. facade()
+    hands out the asyncio engine of a configuration behind a SyncFacade, for
+    routes that send many requests at once.
+    """
+    def __init__(self, scheme="https", template_store=None, max_concurrency=32, pool_maxsize=None):
+        self.scheme = scheme
+        self.template_store = template_store
+        self.max_concurrency = max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self._clients = {}
+        self._facades = {}
+        self._lock = threading.Lock()
+
+    def get(self, config_id):
+        """
+        Return the client for a configuration, building it on first use
+
+        Args:
+            config_id (int): ID of the stored configuration
+
+        Returns:
+            ElasticAutomation: The client, or None if the configuration does not exist
+        """
+        try:
+            config_id = int(config_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            automation = self._clients.get(config_id)
+        if automation is not None:
+            return automation
+
+        config = Configuration.query.get(config_id)
+        if not config:
+            return None
+
+        automation = ElasticAutomation.from_configuration(config, scheme=self.scheme,
+                                                         template_store=self.template_store,
+                                                         max_concurrency=self.max_concurrency,
+                                                         pool_maxsize=self.pool_maxsize)
+        with self._lock:
+            current = self._clients.setdefault(config_id, automation)
+        if current is not automation:
+            automation.close()
+        return current
+
+    def facade(self, config_id):
+        """
+        Return the SyncFacade over the AsyncElasticAutomation of a configuration, building it on first use
+
+        Args:
+            config_id (int): ID of the stored configuration
+
+        Returns:
+            SyncFacade: The facade, or None if the configuration does not exist
+        """
+        # asyncAutomation imports this module
+        from app.asyncAutomation import AsyncElasticAutomation, SyncFacade
+
+        try:
+            config_id = int(config_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            facade = self._facades.get(config_id)
+        if facade is not None:
+            return facade
+
+        config = Configuration.query.get(config_id)
+        if not config:
+            return None
+
+        facade = SyncFacade(AsyncElasticAutomation.from_configuration(config, scheme=self.scheme))
+        with self._lock:
+            current = self._facades.setdefault(config_id, facade)
+        if current is not facade:
+            facade.close()
+        return current
+
+    def invalidate(self, config_id):
+        """
+        Drop and close the clients of a configuration that was changed or deleted
+
+        Args:
+            config_id (int): ID of the stored configuration
+        """
+        with self._lock:
+            automation = self._clients.pop(int(config_id), None)
+            facade = self._facades.pop(int(config_id), None)
+        if automation is not None:
+            automation.close()
+        if facade is not None:
+            facade.close()
+
+    def clear(self):
+        with self._lock:
+            clients = list(self._clients.values()) + list(self._facades.values())
+            self._clients.clear()
+            self._facades.clear()
+        for automation in clients:
+            automation.close()
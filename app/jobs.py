@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import AutomationJob
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+    In-process queue running long automations on a worker pool
+
+    Job state and per-step progress are persisted in the AutomationJob table,
+    so any web worker can report on a job while it runs. Every job records
+    the process that owns it, which refreshes heartbeat_at while the job is
+    queued or running; a job whose heartbeat is older than stale_after was
+    left behind by a process that died and is marked failed.
+
+    Args:
+        app (Flask): Application whose database holds the jobs
+        max_workers (int): Jobs running at the same time
+        heartbeat_interval (float): Seconds between heartbeats of the owned jobs
+        stale_after (float): Seconds without heartbeat before a job counts as interrupted
+    """
+    def __init__(self, app, max_workers=4, heartbeat_interval=10, stale_after=60):
+        self.app = app
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="automation-job")
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def submit(self, config_id, client_id, request_data, work):
+        """
+        Queue a job and return its ID right away
+
+        Args:
+            config_id (int): Configuration the job runs against
+            client_id (str): Tenant the job works on
+            request_data (dict): Original request, kept for reference
+            work (callable): Called in a worker with an on_step(name, result)
+                callback; its return value becomes the job results
+
+        Returns:
+            str: The job ID
+        """
+        job = AutomationJob(
+            job_id=str(uuid.uuid4()),
+            config_id=int(config_id),
+            client_id=str(client_id) if client_id is not None else None,
+            status='queued',
+            request=json.dumps(request_data),
+            progress='[]',
+            owner=self.owner,
+            heartbeat_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self._start_heartbeat()
+        self._executor.submit(self._run, job.job_id, work)
+        return job.job_id
+
+    def _start_heartbeat(self):
+        # Only processes that actually run jobs keep a heartbeat thread
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="automation-job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                with self.app.app_context():
+                    AutomationJob.query.filter(
+                        AutomationJob.owner == self.owner,
+                        AutomationJob.status.in_(['queued', 'running'])
+                    ).update({AutomationJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+                    self.fail_interrupted()
+            except Exception:
+                with self.app.app_context():
+                    db.session.rollback()
+
+    def _update(self, job_id, **fields):
+        with self.app.app_context():
+            job = db.session.get(AutomationJob, job_id)
+            for name, value in fields.items():
+                setattr(job, name, value)
+            db.session.commit()
+
+    def _record_step(self, job_id, name, result):
+        # Steps of one job finish on several threads
+        with self._lock, self.app.app_context():
+            job = db.session.get(AutomationJob, job_id)
+            progress = json.loads(job.progress)
+            progress.append({"operation": name, "status": result.get("status", "success") if isinstance(result, dict) else "success"})
+            job.progress = json.dumps(progress)
+            db.session.commit()
+
+    def _run(self, job_id, work):
+        try:
+            self._update(job_id, status='running')
+            results = work(lambda name, result: self._record_step(job_id, name, result))
+            self._update(job_id, status='finished', results=json.dumps(results, default=str))
+        except Exception as e:
+            # Also covers results that can't be stored, so no job is left running forever
+            logger.exception("Automation job %s failed", job_id)
+            try:
+                with self.app.app_context():
+                    db.session.rollback()
+                self._update(job_id, status='failed', error=str(e))
+            except Exception:
+                logger.exception("Could not mark automation job %s as failed", job_id)
+
+    def _stale(self, job):
+        return (job.status in ('queued', 'running') and job.owner != self.owner
+                and (job.heartbeat_at is None
+                     or datetime.utcnow() - job.heartbeat_at > timedelta(seconds=self.stale_after)))
+
+    def get(self, job_id):
+        job = db.session.get(AutomationJob, job_id)
+        if job is not None and self._stale(job):
+            job.status = 'failed'
+            job.error = 'Interrupted by a restart'
+            db.session.commit()
+        return job.to_dict() if job else None
+
+    def fail_interrupted(self):
+        """
+        Mark jobs whose owning process stopped sending heartbeats as failed
+
+        Jobs of live processes, this one included, are left alone.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        jobs = AutomationJob.query.filter(
+            AutomationJob.status.in_(['queued', 'running']),
+            AutomationJob.owner.is_distinct_from(self.owner),
+            db.or_(AutomationJob.heartbeat_at.is_(None), AutomationJob.heartbeat_at < cutoff)
+        ).all()
+        for job in jobs:
+            job.status = 'failed'
+            job.error = 'Interrupted by a restart'
+        db.session.commit()
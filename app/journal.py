@@ -0,0 +1,196 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from app import db
+from app.models import StepJournal
+
+logger = logging.getLogger(__name__)
+
+# Statuses of steps a resumed run leaves alone
+COMPLETED_STATUSES = ('success',)
+
+_FLUSH = object()
+_STOP = object()
+
+class JournalWriter:
+    """
+    Durable record of the onboarding steps of every tenant
+
+    record() only enqueues; a writer thread upserts the pending entries into
+    the StepJournal table in one transaction per batch, so journaling never
+    holds up the steps themselves. Entries are keyed by (config_id,
+    client_id, step) and the latest status wins. A config_id of 0 stands for
+    runs without a stored configuration.
+
+    Args:
+        app (Flask): Application whose database holds the journal
+        flush_interval (float): Longest time an entry waits before being written
+        batch_size (int): Entries written per transaction at most
+    """
+    def __init__(self, app, flush_interval=0.5, batch_size=500):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="step-journal", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, config_id, client_id, step, status, started_at=None, duration=None, response=None):
+        """
+        Queue the state of a step
+
+        Args:
+            config_id (int): Configuration the run uses, None for none
+            client_id: Tenant the step belongs to
+            step (str): Step name from TENANT_STEPS
+            status (str): pending, success, error or skipped
+            started_at (datetime): When the step started
+            duration (float): Seconds the step took
+            response: Result of the step, stored as JSON
+        """
+        self._queue.put({
+            "config_id": int(config_id or 0),
+            "client_id": str(client_id),
+            "step": step,
+            "status": status,
+            "started_at": started_at,
+            "duration": duration,
+            "response": json.dumps(response, default=str) if response is not None else None,
+        })
+
+    def completed(self, config_id, client_ids=None):
+        """
+        Steps already done per tenant, read in one query
+
+        Args:
+            config_id (int): Configuration the run uses, None for none
+            client_ids (list): Tenants to look up, all of them when None
+
+        Returns:
+            dict: client_id (str) -> set of completed step names
+        """
+        self.flush()
+        with self.app.app_context():
+            query = StepJournal.query.filter(StepJournal.config_id == int(config_id or 0),
+                                             StepJournal.status.in_(COMPLETED_STATUSES))
+            if client_ids is not None:
+                query = query.filter(StepJournal.client_id.in_([str(client_id) for client_id in client_ids]))
+
+            done = {}
+            for client_id, step in query.with_entities(StepJournal.client_id, StepJournal.step):
+                done.setdefault(client_id, set()).add(step)
+            return done
+
+    def forget(self, config_id, steps_by_client):
+        """
+        Drop the entries of steps that were undone since, such as by a
+        teardown, so a resumed run does them again
+
+        Args:
+            config_id (int): Configuration the run uses, None for none
+            steps_by_client (dict): Step names to forget keyed by client ID
+        """
+        self.flush()
+        groups = {}
+        for client_id, steps in steps_by_client.items():
+            if steps:
+                groups.setdefault(frozenset(steps), []).append(str(client_id))
+
+        with self.app.app_context():
+            try:
+                for steps, client_ids in groups.items():
+                    (StepJournal.query
+                     .filter(StepJournal.config_id == int(config_id or 0),
+                             StepJournal.client_id.in_(client_ids),
+                             StepJournal.step.in_(steps))
+                     .delete(synchronize_session=False))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def flush(self):
+        """
+        Block until every entry queued so far is written
+        """
+        written = threading.Event()
+        self._queue.put((_FLUSH, written))
+        written.wait()
+
+    def close(self):
+        """
+        Write the remaining entries and stop the writer thread
+        """
+        self.flush()
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    waiters.append(item[1])
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        # Later entries of the same step replace earlier ones within a batch
+        entries = {}
+        for entry in batch:
+            key = (entry["config_id"], entry["client_id"], entry["step"])
+            finished = entry["status"] != "pending"
+            if key in entries:
+                finished += entries[key]["finished"]
+                entry = {**entries[key], **{name: value for name, value in entry.items() if value is not None}}
+            entries[key] = dict(entry, finished=finished)
+
+        with self.app.app_context():
+            try:
+                config_ids = {key[0] for key in entries}
+                client_ids = {key[1] for key in entries}
+                existing = {
+                    (row.config_id, row.client_id, row.step): row
+                    for row in StepJournal.query.filter(StepJournal.config_id.in_(config_ids),
+                                                        StepJournal.client_id.in_(client_ids))
+                }
+                for key, entry in entries.items():
+                    row = existing.get(key)
+                    if row is None:
+                        row = StepJournal(config_id=key[0], client_id=key[1], step=key[2], attempts=0)
+                        db.session.add(row)
+                    row.status = entry["status"]
+                    row.attempts = (row.attempts or 0) + entry["finished"]
+                    for name in ("started_at", "duration", "response"):
+                        if entry[name] is not None:
+                            setattr(row, name, entry[name])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Failed to write %d step journal entries", len(entries))
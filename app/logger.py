@@ -0,0 +1,133 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+# Fields attached to every record logged while a log_context block runs
+_context = contextvars.ContextVar("log_context", default={})
+
+_listener = None
+
+@contextmanager
+def log_context(**fields):
+    """
+    Attach fields such as client_id or space to the records logged inside the block
+
+    The fields follow the context into work started with contextvars.copy_context(),
+    which is how StepScheduler hands them to its worker threads.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """
+    Copy the log_context fields onto the record in the thread that logged it
+    """
+    def filter(self, record):
+        record.fields = {**_context.get(), **getattr(record, "fields", {})}
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records below WARNING; warnings and errors always pass
+    """
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.sample_rate >= 1 or random.random() < self.sample_rate
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message and the record fields
+    """
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback out of the message
+
+    The stock prepare() formats the record, appending the traceback to the
+    message, and drops exc_info. Here the message is only merged with its
+    args and the traceback is kept in exc_text, so JsonFormatter still writes
+    it as the exception field on the listener thread.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            # Tracebacks hold frames alive; the text is all the writer needs
+            record.exc_info = None
+        return record
+
+def configure_logging(level="INFO", sample_rate=1.0, stream=None, logger_name="app"):
+    """
+    Send the app's log records through a queue to a JSON writer thread
+
+    Callers only pay for filtering and enqueueing a record; formatting and the
+    write to the stream happen on the QueueListener thread. Calling it again
+    replaces the previous setup.
+
+    Args:
+        level (str|int): Minimum level logged
+        sample_rate (float): Fraction of records below WARNING kept, for
+            high-volume batch runs
+        stream: Where the JSON lines go, stderr by default
+        logger_name (str): Logger whose records are handled
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    records = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter())
+
+    logger = logging.getLogger(logger_name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, writer, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+@atexit.register
+def _flush():
+    if _listener is not None:
+        _listener.stop()
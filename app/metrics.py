@@ -0,0 +1,241 @@
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Latency buckets in seconds, from a cached lookup to a large import
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter with one series per label combination
+    """
+    kind = "counter"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+class Histogram:
+    """
+    Cumulative histogram with one set of buckets per label combination
+    """
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._series.items()}
+        for key, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["buckets"]):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(value['sum'])}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {value['count']}"
+
+class Registry:
+    """
+    Set of metrics rendered together in the Prometheus text format
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+OPERATIONS = REGISTRY.counter(
+    "automation_operations_total", "ElasticAutomation operations run", ("operation", "host"))
+OPERATION_ERRORS = REGISTRY.counter(
+    "automation_operation_errors_total", "ElasticAutomation operations that raised or returned an error",
+    ("operation", "host"))
+OPERATION_LATENCY = REGISTRY.histogram(
+    "automation_operation_duration_seconds", "Duration of ElasticAutomation operations", ("operation", "host"))
+HTTP_REQUESTS = REGISTRY.counter(
+    "automation_http_requests_total", "Requests sent to Elasticsearch and Kibana",
+    ("operation", "host", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "automation_http_request_duration_seconds", "Latency of requests sent to Elasticsearch and Kibana",
+    ("operation", "host"))
+FLASK_LATENCY = REGISTRY.histogram(
+    "flask_request_duration_seconds", "Latency of requests served by the web app", ("route", "method", "status"))
+
+# Running operations, outermost first; a ContextVar so work handed to a pool
+# through contextvars.copy_context().run stays attributed to its parent
+_stack = contextvars.ContextVar("operation_stack", default=())
+
+logger = logging.getLogger("app.operations")
+
+class _Operation:
+    def __init__(self, name):
+        self.name = name
+        self.hosts = set()
+        self.failed = False
+
+def host_label(url):
+    """
+    host:port of a request URL, the host label of every automation metric
+    """
+    return urlsplit(url).netloc
+
+def operation_names():
+    """
+    Names of the operations running in the current context, outermost first
+    """
+    return [frame.name for frame in _stack.get()]
+
+def current_operation():
+    """
+    Name of the innermost operation running in the current context, if any
+    """
+    stack = _stack.get()
+    return stack[-1].name if stack else None
+
+@contextmanager
+def operation(name):
+    """
+    Time an operation and count it, labelled by the hosts its requests went to
+
+    Requests sent while the block runs are attributed to it. The operation
+    counts as an error when the block raises or sets failed on the
+    yielded frame. Its outcome is logged at INFO, or DEBUG when nested in
+    another operation, and at WARNING when it failed.
+    """
+    stack = _stack.get()
+    frame = _Operation(name)
+    token = _stack.set(stack + (frame,))
+    started = time.perf_counter()
+    try:
+        yield frame
+    except BaseException:
+        frame.failed = True
+        raise
+    finally:
+        _stack.reset(token)
+        duration = time.perf_counter() - started
+        host = ",".join(sorted(frame.hosts))
+        OPERATIONS.inc(operation=name, host=host)
+        OPERATION_LATENCY.observe(duration, operation=name, host=host)
+        if frame.failed:
+            OPERATION_ERRORS.inc(operation=name, host=host)
+
+        status = "error" if frame.failed else "success"
+        level = logging.WARNING if frame.failed else logging.DEBUG if stack else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, f"{name} {'failed' if frame.failed else 'finished'}", extra={"fields": {
+                "operation": name, "host": host, "status": status, "duration_ms": round(duration * 1000, 1)
+            }})
+
+def instrumented(func):
+    """
+    Record a method as an operation named after it
+
+    A dict result with status "error" counts as a failed operation.
+    Coroutine functions are awaited inside the operation.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with operation(func.__name__) as frame:
+                result = await func(*args, **kwargs)
+                if isinstance(result, dict) and result.get("status") == "error":
+                    frame.failed = True
+                return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(func.__name__) as frame:
+            result = func(*args, **kwargs)
+            if isinstance(result, dict) and result.get("status") == "error":
+                frame.failed = True
+            return result
+    return wrapper
+
+def observe_request(url, method, status, duration):
+    """
+    Record one HTTP request against the operations running on this thread
+
+    Args:
+        url (str): Request URL
+        method (str): HTTP method
+        status (int|str): Response status, or the exception name when none came back
+        duration (float): Seconds the request took
+    """
+    host = host_label(url)
+    stack = _stack.get()
+    for frame in stack:
+        frame.hosts.add(host)
+    name = stack[-1].name if stack else ""
+    HTTP_REQUESTS.inc(operation=name, host=host, method=method.upper(), status=status)
+    HTTP_LATENCY.observe(duration, operation=name, host=host)
@@ -1,3 +1,6 @@
+import json
+from datetime import datetime
+
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
@@ -22,4 +25,92 @@ class Configuration(db.Model):
     kb_port = db.Column(db.String(10), nullable=False)
     es_user = db.Column(db.String(255), nullable=False)
     es_pass = db.Column(db.String(255), nullable=False)
-    es_index_name = db.Column(db.String(255), nullable=False)
\ No newline at end of file
+    es_index_name = db.Column(db.String(255), nullable=False)
+
+class AutomationJob(db.Model):
+    job_id = db.Column(db.String(36), primary_key=True)
+    config_id = db.Column(db.Integer, nullable=False, index=True)
+    client_id = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    request = db.Column(db.Text, nullable=False)
+    progress = db.Column(db.Text, nullable=False, default='[]')
+    results = db.Column(db.Text)
+    error = db.Column(db.Text)
+    # Process running the job and when it last reported being alive
+    owner = db.Column(db.String(128))
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'config_id': self.config_id,
+            'client_id': self.client_id,
+            'status': self.status,
+            'progress': json.loads(self.progress),
+            'results': json.loads(self.results) if self.results else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class StepJournal(db.Model):
+    __table_args__ = (db.UniqueConstraint('config_id', 'client_id', 'step'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    config_id = db.Column(db.Integer, nullable=False, default=0, index=True)
+    client_id = db.Column(db.String(64), nullable=False)
+    step = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)
+    response = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'config_id': self.config_id,
+            'client_id': self.client_id,
+            'step': self.step,
+            'status': self.status,
+            'attempts': self.attempts,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'duration': self.duration,
+            'response': json.loads(self.response) if self.response else None,
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class DashboardTemplate(db.Model):
+    __table_args__ = (db.UniqueConstraint('config_id', 'dashboard_id', 'version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    config_id = db.Column(db.Integer, nullable=False, index=True)
+    dashboard_id = db.Column(db.String(64), nullable=False)
+    title = db.Column(db.String(255))
+    version = db.Column(db.Integer, nullable=False, default=1)
+    content_hash = db.Column(db.String(64), nullable=False)
+    source_space_id = db.Column(db.String(255), nullable=False, default='default')
+    source_data_view = db.Column(db.String(255), nullable=False)
+    object_count = db.Column(db.Integer, nullable=False, default=0)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    # Read only when a copy needs it, never when listing
+    bundle = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'config_id': self.config_id,
+            'dashboard_id': self.dashboard_id,
+            'title': self.title,
+            'version': self.version,
+            'content_hash': self.content_hash,
+            'source_space_id': self.source_space_id,
+            'source_data_view': self.source_data_view,
+            'object_count': self.object_count,
+            'size': self.size,
+            'created_at': self.created_at.isoformat()
+        }
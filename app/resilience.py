@@ -0,0 +1,185 @@
+import email.utils
+import random
+import threading
+import time
+
+# Statuses worth another attempt after a pause
+RETRYABLE_STATUSES = frozenset([429, 502, 503, 504])
+
+# Statuses telling the adaptive limiter the cluster is overloaded
+OVERLOAD_STATUSES = frozenset([429, 503])
+
+# Statuses counted as failures by the circuit breaker
+FAILURE_STATUSES = frozenset([502, 503, 504])
+
+# Methods safe to resend when a request may already have reached the server
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a host whose circuit is open
+    """
+
+class RetryPolicy:
+    """
+    How many times to retry a call and how long to wait in between
+
+    Waits grow exponentially with full jitter, so clients backing off from
+    the same overload don't retry in lockstep. A Retry-After header sent by
+    the server takes precedence over the computed wait.
+    """
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, statuses=RETRYABLE_STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    @staticmethod
+    def retry_after(response):
+        """
+        Seconds to wait according to the Retry-After header, or None when absent
+
+        Args:
+            response: Response carrying the header, from requests or httpx
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def delay(self, attempt, response=None):
+        """
+        Seconds to sleep before the next attempt
+
+        Args:
+            attempt (int): Number of attempts already made, starting at 0
+            response: Response of the failed attempt, if one came back
+
+        Returns:
+            float|None: The wait, or None when the server asks for a longer
+                pause than max_backoff and the call should not be retried
+        """
+        if response is not None:
+            retry_after = self.retry_after(response)
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_backoff else None
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError. Once reset_timeout seconds have passed a
+    single probe call is let through: its success closes the circuit again,
+    its failure keeps it open for another reset_timeout.
+    """
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Let a call through, or raise CircuitOpenError when the circuit is open
+        """
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit open for {self.name} after {self.failures} failures")
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpenError(f"Circuit half open for {self.name}, waiting for the probe call")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to the health of a host (AIMD)
+
+    Every successful call raises the limit by roughly one per limit's worth
+    of calls, up to maximum. An overload signal (429, 503, timeout) halves it,
+    at most once per cooldown seconds so a burst of failures from the same
+    moment counts as one, down to minimum. Callers beyond the limit wait.
+    """
+    def __init__(self, initial=8, minimum=1, maximum=32, decrease=0.5, cooldown=1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded=False):
+        """
+        Free a slot and adjust the limit
+
+        Args:
+            overloaded (bool): The call was rejected or timed out under load
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class RateLimiter:
+    """
+    Spread calls evenly at no more than rate per second
+
+    Args:
+        rate (float): Calls allowed per second; 0 or None disables the limit
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
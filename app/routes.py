@@ -1,13 +1,147 @@
-from flask import flash, request, jsonify, render_template, redirect, url_for, session
+import gzip
+import hmac
+import json
+import os
+import time
+from flask import Response, flash, g, request, jsonify, render_template, redirect, url_for, session
 from flask_login import current_user, login_required, login_user, logout_user
 import urllib3
-from app import app, db, dashboardMigration
+from app import app, asyncAutomation, db, dashboardMigration, jobs, journal, metrics, templateStore
 from app.forms import ConfigurationForm, LoginForm, RegistrationForm
 from app.models import Configuration, User
 
 # Suppress only InsecureRequestWarning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Captured dashboard bundles, copied to tenants instead of live exports
+template_store = templateStore.TemplateStore(app)
+
+# Warm clients shared by every request, keyed by Configuration.config_id;
+# ELASTIC_SCHEME=http targets clusters (or the benchmark stand-in) without TLS
+client_registry = dashboardMigration.ClientRegistry(scheme=os.getenv("ELASTIC_SCHEME", "https"),
+                                                    template_store=template_store)
+
+# Long automations run here instead of holding a web worker
+job_queue = jobs.JobQueue(app, max_workers=4)
+
+# Longest a /jobs/<id>/events stream holds a web worker
+JOB_EVENTS_TIMEOUT = float(os.getenv("JOB_EVENTS_TIMEOUT", "60"))
+
+# Every onboarding step lands here so an interrupted run can be resumed
+step_journal = journal.JournalWriter(app)
+
+def require_config_id(data):
+    """
+    The config_id of a request as an int, or the 400 response to send when it
+    is missing or not a number
+    """
+    config_id = data.get("config_id")
+    if not config_id:
+        return None, (jsonify({"error": "No configuration selected"}), 400)
+    try:
+        return int(config_id), None
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": f"Invalid config_id: {config_id}"}), 400)
+
+def get_automation(data):
+    """
+    The warm registry client of a request's config_id, or the response to
+    send when the config_id is missing, invalid or unknown
+    """
+    config_id, error = require_config_id(data)
+    if error:
+        return None, error
+    automation = client_registry.get(config_id)
+    if automation is None:
+        return None, (jsonify({"error": "Configuration not found"}), 404)
+    return automation, None
+
+# Built-in objects hidden from the listings unless include_reserved is sent
+SYSTEM_ROLE_PREFIXES = ("kibana_", "logstash_", "beats_", "apm_", "remote_monitoring_", "reporting_", "ml_")
+SYSTEM_DATAVIEW_PREFIXES = (".kibana", "metrics-", "logs-", "apm-")
+
+# Listing pages are capped so a single request stays small
+MAX_PAGE_SIZE = 500
+
+def is_reserved(item):
+    metadata = item.get("metadata") or {}
+    return bool(metadata.get("_reserved") or metadata.get("_deprecated"))
+
+def require_page(data):
+    """
+    The page and per_page of a listing request, clamped to their bounds, or
+    the 400 response to send when either is not a number
+    """
+    try:
+        page = max(1, int(data.get("page", 1)))
+        per_page = max(1, min(int(data.get("per_page", 50)), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "page and per_page must be numbers"}), 400)
+    return (page, per_page), None
+
+def paginate(items, data, key, page, per_page):
+    """
+    Filter, sort and slice a listing according to the request parameters
+
+    Args:
+        items (list): Listing entries as dicts
+        data (dict): Request parameters: prefix, sort and order
+        key (str): Field holding the entry name, used for prefix and default sort
+        page (int): Page to return, from require_page
+        per_page (int): Entries per page, from require_page
+
+    Returns:
+        dict: The page items along with total, page and per_page
+    """
+    prefix = data.get("prefix")
+    if prefix:
+        items = [item for item in items if str(item.get(key, "")).startswith(prefix)]
+
+    sort = data.get("sort") or key
+    items = sorted(items, key=lambda item: str(item.get(sort, "")), reverse=data.get("order") == "desc")
+
+    start = (page - 1) * per_page
+    return {"items": items[start:start + per_page], "total": len(items), "page": page, "per_page": per_page}
+
+def compact_json(payload, status=200):
+    """
+    JSON response without whitespace, gzip compressed when the client accepts it
+    """
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    response = Response(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if len(body) > 1024 and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(body))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.FLASK_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method,
+                                      status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Automation, Elasticsearch/Kibana and web request metrics in the Prometheus
+    text format. The labels name the cluster hosts, so the page is served to
+    logged-in users, or to a scraper sending "Authorization: Bearer
+    <METRICS_TOKEN>" when that variable is set.
+    """
+    token = os.getenv("METRICS_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if not current_user.is_authenticated and not (token and hmac.compare_digest(authorization, f"Bearer {token}")):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain", headers={"WWW-Authenticate": "Bearer"})
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/")
 @login_required
 def index():
@@ -78,6 +212,7 @@ def save_configuration():
                 config.es_index_name = form.es_index_name.data
 
                 db.session.commit()
+                client_registry.invalidate(config.config_id)
 
                 flash('Configuration updated successfully!', 'success')
                 return redirect(url_for("index"))
@@ -114,6 +249,7 @@ def get_configuration(config_id):
         config = Configuration.query.get_or_404(config_id)
         db.session.delete(config)
         db.session.commit()
+        client_registry.invalidate(config_id)
         return jsonify({'message': 'Configuration deleted successfully!'})
     elif request.method == 'GET':
       config = Configuration.query.get_or_404(config_id)
@@ -134,10 +270,12 @@ def get_configuration(config_id):
 def get_spaces():
     try:
         data = request.json
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
+        automation, error = get_automation(data)
+        if error:
+            return error
 
         # Fetch spaces from Kibana
-        spaces = automation.get_spaces()
+        spaces = automation.get_spaces(refresh=data.get("refresh", False))
         return jsonify({"spaces": spaces})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -147,11 +285,26 @@ def get_spaces():
 def get_roles():
     try:
         data = request.json
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
+        automation, error = get_automation(data)
+        if error:
+            return error
+        paging, error = require_page(data)
+        if error:
+            return error
+        page, per_page = paging
 
         # Fetch roles from Kibana
-        roles = automation.get_roles()
-        return jsonify({"roles": roles})
+        roles = automation.get_roles(refresh=data.get("refresh", False))
+        if isinstance(roles, dict):
+            return jsonify({"error": roles.get("message")}), 502
+
+        if not data.get("include_reserved"):
+            roles = [role for role in roles
+                     if not is_reserved(role) and not role["name"].lower().startswith(SYSTEM_ROLE_PREFIXES)]
+
+        listing = paginate(roles, data, "name", page, per_page)
+        listing["roles"] = listing.pop("items")
+        return compact_json(listing)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -160,12 +313,26 @@ def get_roles():
 def get_users():
     try:
         data = request.json
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
-
-        # Fetch users from Kibana
-        users = automation.get_users()
-
-        return jsonify(users)
+        automation, error = get_automation(data)
+        if error:
+            return error
+        paging, error = require_page(data)
+        if error:
+            return error
+        page, per_page = paging
+
+        # Fetch users from Elasticsearch
+        users = automation.get_users(refresh=data.get("refresh", False))
+        if users.get("status") == "error":
+            return jsonify({"error": users.get("message")}), 502
+
+        users = [dict(user, username=username) for username, user in users.items()]
+        if not data.get("include_reserved"):
+            users = [user for user in users if not is_reserved(user)]
+
+        listing = paginate(users, data, "username", page, per_page)
+        listing["users"] = listing.pop("items")
+        return compact_json(listing)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -174,11 +341,23 @@ def get_users():
 def get_dataviews():
     try:
         data = request.json
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
+        automation, error = get_automation(data)
+        if error:
+            return error
+        paging, error = require_page(data)
+        if error:
+            return error
+        page, per_page = paging
 
         # Fetch dataviews from Kibana
-        dataviews = automation.get_dataviews()
-        return jsonify({"dataviews": dataviews})
+        dataviews = automation.get_dataviews(refresh=data.get("refresh", False))["data_view"]
+        if not data.get("include_reserved"):
+            dataviews = [dataview for dataview in dataviews
+                         if not dataview.get("title", "").lower().startswith(SYSTEM_DATAVIEW_PREFIXES)]
+
+        listing = paginate(dataviews, data, "name", page, per_page)
+        listing["dataviews"] = listing.pop("items")
+        return compact_json(listing)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
         
@@ -193,79 +372,260 @@ def delete_space():
         if not space_id:
             return jsonify({"success": False, "message": "No space ID provided"}), 400
             
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
+        automation, error = get_automation(data)
+        if error:
+            return error
         
         automation.delete_space(space_id)
         return jsonify({"success": True, "message": f"Space {space_id} deleted successfully"})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route("/templates", methods=["GET"])
+@login_required
+def list_templates():
+    config_id = request.args.get("config_id", type=int)
+    if not config_id:
+        return jsonify({"error": "No configuration selected"}), 400
+
+    templates = template_store.list(config_id, dashboard_id=request.args.get("dashboard_id"))
+    if request.args.get("latest", "false").lower() == "true":
+        newest = {}
+        for template in templates:
+            newest.setdefault(template["dashboard_id"], template)
+        templates = list(newest.values())
+    return jsonify({"templates": templates, "total": len(templates)})
+
+@app.route("/templates/capture", methods=["POST"])
+@login_required
+def capture_templates():
+    data = request.json
+
+    config_id, error = require_config_id(data)
+    if error:
+        return error
+
+    automation = client_registry.get(config_id)
+    if automation is None:
+        return jsonify({"error": "Configuration not found"}), 404
+
+    result = template_store.capture(
+        automation,
+        config_id,
+        data.get("dashboard_ids") or dashboardMigration.DEFAULT_DASHBOARD_IDS,
+        source_space_id=data.get("source_space_id", "default"),
+        source_data_view=data.get("source_data_view", dashboardMigration.DEFAULT_SOURCE_DATA_VIEW)
+    )
+    return jsonify(result), 502 if result["status"] == "error" else 200
+
+@app.route("/teardown", methods=["POST"])
+@login_required
+def teardown():
+    data = request.json
+
+    config_id, error = require_config_id(data)
+    if error:
+        return error
+
+    client_ids = data.get("client_ids")
+    if not client_ids:
+        return jsonify({"error": "No tenants provided"}), 400
+
+    automation = client_registry.get(config_id)
+    if automation is None:
+        return jsonify({"error": "Configuration not found"}), 404
+
+    def work(on_step):
+        return automation.teardown_tenants(client_ids, steps=data.get("steps"),
+                                           max_workers=int(data.get("max_workers", 8)),
+                                           journal=step_journal, config_id=config_id)
+
+    job_id = job_queue.submit(config_id, None, data, work)
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("get_job", job_id=job_id),
+        "events_url": url_for("job_events", job_id=job_id)
+    }), 202
+
 @app.route("/run_automation", methods=["POST"])
 @login_required
 def run_automation():
     data = request.json
 
     # Get the selected configuration
-    config_id = data.get("config_id")
-    if not config_id:
-        return jsonify({"error": "No configuration selected"}), 400
+    config_id, error = require_config_id(data)
+    if error:
+        return error
 
-    # Fetch the configuration from the database
-    config = Configuration.query.get(config_id)
-    if not config:
+    # Reuse the warm client of the selected configuration
+    automation = client_registry.get(config_id)
+    if automation is None:
         return jsonify({"error": "Configuration not found"}), 404
 
-    # Prepare the automation data
-    automation_data = {
-        "elastic_host": config.es_url,
-        "elastic_port": config.es_port,
-        "kibana_host": config.kb_url,
-        "kibana_port": config.kb_port,
-        "username": config.es_user,
-        "password": config.es_pass,
-        "es_index_name": config.es_index_name,
-        "client_id": data.get("client_id"),
-        "space_name": data.get("space_name")
-    }
-
-    # Initialize the automation object
-    automation = dashboardMigration.ElasticAutomation.from_config(automation_data)
-
-    # Prepare variables for automation tasks
+    # Execute only the checked tasks, independent ones in parallel
+    steps = [name for name, _ in dashboardMigration.TENANT_STEPS if data.get(name, False)]
     client_id = data.get("client_id")
-    bi_client_name = f'client_{client_id}'
-    bi_role_name = f'{bi_client_name}_role'
-    bi_indice = "dguard-analytics-events-demo"
-    bi_alias_name = f'{bi_client_name}_alias'
-    bi_space_id = f'{bi_client_name}_space'
-    bi_space_name = f'{data.get("space_name")}'
-    bi_data_view_name = f'{bi_client_name}_data_view'
+    space_name = f'{data.get("space_name")}'
+
+    def work(on_step):
+        if data.get("reconcile", False):
+            # Only issue the operations whose target state is missing or changed
+            reconciled = automation.reconcile_tenants(
+                [{"client_id": client_id, "space_name": space_name}],
+                index_pattern="dguard-analytics-events-demo",
+                steps=steps,
+                config_id=config_id
+            )
+            applied = {operation["operation"]: operation["result"] for operation in reconciled["results"][0]["results"]}
+            for name in steps:
+                on_step(name, applied.get(name, {"status": "unchanged"}))
+            return [applied.get(name, {"status": "unchanged", "message": "Already up to date"}) for name in steps]
+
+        completed = ()
+        if data.get("resume", False):
+            # Skip what an earlier run finished, retry what failed or never ran
+            completed = step_journal.completed(config_id, [client_id]).get(str(client_id), set())
+
+        operations = dashboardMigration.onboard_tenant(
+            automation,
+            client_id=client_id,
+            index_pattern="dguard-analytics-events-demo",
+            space_name=space_name,
+            steps=steps,
+            config_id=config_id,
+            on_step=on_step,
+            journal=step_journal,
+            completed=completed
+        )
+        return [operation["result"] for operation in operations]
+
+    # Run in the background and hand back the job to follow
+    job_id = job_queue.submit(config_id, client_id, data, work)
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("get_job", job_id=job_id),
+        "events_url": url_for("job_events", job_id=job_id)
+    }), 202
+
+@app.route("/reconcile", methods=["POST"])
+@login_required
+def reconcile():
+    data = request.json
+
+    config_id, error = require_config_id(data)
+    if error:
+        return error
 
-    results = []
+    tenants = data.get("tenants") or data.get("client_ids")
+    if not tenants:
+        return jsonify({"error": "No tenants provided"}), 400
 
-    # Execute only the checked tasks
-    if data.get("create_index_alias", False):
-        results.append(automation.create_index_alias(bi_indice, bi_alias_name, client_id))
+    automation = client_registry.get(config_id)
+    if automation is None:
+        return jsonify({"error": "Configuration not found"}), 404
+
+    index_pattern = data.get("index_pattern", "dguard-analytics-events-demo")
+    steps = data.get("steps")
+
+    if data.get("dry_run", False):
+        try:
+            return jsonify(automation.reconcile_tenants(tenants, index_pattern, steps=steps, dry_run=True))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
 
-    if data.get("create_space", False):
-        results.append(automation.create_space(bi_space_id, name=bi_space_name, description="Space for events analysis"))
+    def work(on_step):
+        return automation.reconcile_tenants(tenants, index_pattern, steps=steps, config_id=config_id)
 
-    if data.get("create_role", False):
-        results.append(automation.create_role(role_name=bi_role_name, indice=bi_alias_name, space=bi_space_id))
+    job_id = job_queue.submit(config_id, None, data, work)
 
-    if data.get("create_user", False):
-        results.append(automation.create_user(username=bi_client_name, password=bi_client_name, roles=[bi_role_name]))
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("get_job", job_id=job_id),
+        "events_url": url_for("job_events", job_id=job_id)
+    }), 202
 
-    if data.get("create_data_view", False):
-        results.append(automation.create_data_view(space_id=bi_space_id, dataview_name=bi_data_view_name, index_pattern=bi_alias_name))
+@app.route("/migrate_space", methods=["POST"])
+@login_required
+def migrate_space():
+    data = request.json
+
+    config_id, error = require_config_id(data)
+    if error:
+        return error
+
+    source_space_id = data.get("source_space_id")
+    target_space_id = data.get("target_space_id")
+    if not source_space_id or not target_space_id:
+        return jsonify({"error": "source_space_id and target_space_id are required"}), 400
+
+    automation = client_registry.get(config_id)
+    if automation is None:
+        return jsonify({"error": "Configuration not found"}), 404
 
-    if data.get("copy_dashboards", False):
-        results.append(automation.copy_dashboards(config_id=config_id, client_id=client_id))
+    def work(on_step):
+        return automation.migrate_space(
+            source_space_id,
+            target_space_id,
+            types=data.get("types") or dashboardMigration.MIGRATION_TYPES,
+            data_view_mapping=data.get("data_view_mapping"),
+            on_chunk=on_step
+        )
 
-    # Refresh spaces (if applicable)
-    get_spaces()
+    job_id = job_queue.submit(config_id, None, data, work)
 
-    return jsonify({"results": results})
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("get_job", job_id=job_id),
+        "events_url": url_for("job_events", job_id=job_id)
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+@login_required
+def job_events(job_id):
+    """
+    Stream the state of a job as Server-Sent Events until it finishes
+
+    Each stream holds a web worker, so it ends after JOB_EVENTS_TIMEOUT
+    seconds with a "timeout" event; clients reconnect or poll /jobs/<id>.
+    """
+    deadline = time.monotonic() + JOB_EVENTS_TIMEOUT
+
+    def stream():
+        last_payload = None
+        while True:
+            with app.app_context():
+                job = job_queue.get(job_id)
+
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+
+            payload = json.dumps(job)
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+
+            if job["status"] in ("finished", "failed"):
+                yield f"event: done\ndata: {payload}\n\n"
+                return
+
+            if time.monotonic() >= deadline:
+                yield f"event: timeout\ndata: {payload}\n\n"
+                return
+
+            time.sleep(0.5)
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.route("/create_index_alias", methods=["POST"])
 @login_required
@@ -276,8 +636,9 @@ def create_index_alias():
     bi_alias_name = f'{bi_client_name}_alias'
     bi_indice = data.get("bi_indice")
 
-    data = request.json
-    automation = dashboardMigration.ElasticAutomation.from_config(data)
+    automation, error = get_automation(data)
+    if error:
+        return error
 
     result = automation.create_index_alias(bi_indice, bi_alias_name, bi_client_id)
     return jsonify({"result": result})
@@ -289,43 +650,33 @@ def run_all():
         data = request.json
         
         bi_client_id = data.get("client_id")
-        bi_client_name = f'client_{bi_client_id}'
-        bi_space_id = f'{bi_client_name}_space'
-        bi_space_name = data.get("space_name", "Client Space")
-        bi_role_name = f'{bi_client_name}_role'
         bi_index_name = data.get("bi_index_name")
-        bi_alias_name = f'{bi_client_name}_alias'
-        bi_data_view_name = f'{bi_client_name}_data_view'
-        
+
+        steps = [name for name in ("create_index_alias", "create_space", "create_role", "create_user", "create_data_view")
+                 if data.get(name)]
+
+        if data.get("client_ids"):
+            # Bulk mode: every tenant driven from the configuration's event loop, aliases in bulk
+            config_id, error = require_config_id(data)
+            if error:
+                return error
+            facade = client_registry.facade(config_id)
+            if facade is None:
+                return jsonify({"error": "Configuration not found"}), 404
+            return jsonify({"results": asyncAutomation.onboard_tenants(facade, data.get("client_ids"), bi_index_name, steps)})
+
         # Initialize automation
-        automation = dashboardMigration.ElasticAutomation.from_config(data)
-
-        results = []
-        if data.get("create_index_alias"):
-            results.append({
-                "operation": "create_index_alias",
-                "result": automation.create_index_alias(bi_index_name, bi_alias_name, bi_client_id)
-            })
-        if data.get("create_space"):
-            results.append({
-                "operation": "create_space",
-                "result": automation.create_space(bi_space_id, name=bi_space_name, description="Space for events analysis")
-            })
-        if data.get("create_role"):
-            results.append({
-                "operation": "create_role",
-                "result": automation.create_role(role_name=bi_role_name, indice=bi_alias_name, space=bi_space_id)
-            })
-        if data.get("create_user"):
-            results.append({
-                "operation": "create_user",
-                "result": automation.create_user(username=bi_client_name, password=bi_client_name, roles=[bi_role_name])
-            })
-        if data.get("create_data_view"):
-            results.append({
-                "operation": "create_data_view", 
-                "result": automation.create_data_view(space_id=bi_space_id, dataview_name=bi_data_view_name, index_pattern=bi_alias_name)
-            })
+        automation, error = get_automation(data)
+        if error:
+            return error
+
+        results = dashboardMigration.onboard_tenant(
+            automation,
+            client_id=bi_client_id,
+            index_pattern=bi_index_name,
+            space_name=data.get("space_name", "Client Space"),
+            steps=steps
+        )
 
         return jsonify({"results": results})
     except Exception as e:
@@ -0,0 +1,189 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import func
+
+from app import db
+from app.dashboardMigration import DEFAULT_SOURCE_DATA_VIEW, bundle_hash
+from app.models import DashboardTemplate
+
+logger = logging.getLogger(__name__)
+
+def dashboard_title(bundle, dashboard_id):
+    """
+    Title of a dashboard in an exported NDJSON bundle, or None if it is missing
+    """
+    for line in bundle.splitlines():
+        if not line.strip():
+            continue
+        saved_object = json.loads(line)
+        if saved_object.get('type') == 'dashboard' and saved_object.get('id') == dashboard_id:
+            return saved_object.get('attributes', {}).get('title')
+    return None
+
+class TemplateStore:
+    """
+    Versioned dashboard bundles captured per configuration
+
+    capture() exports dashboards once and stores the NDJSON with its content
+    hash; a new version is only written when the hash changes. latest()
+    serves the newest version of each dashboard to copy_dashboards, so
+    tenant copies no longer export from the source space. Bundles are
+    immutable per hash; the most recently used ones are kept in memory, up to
+    cache_size bytes.
+
+    Args:
+        app (Flask): Application whose database holds the templates
+        cache_size (int): Bytes of bundles kept in memory at most
+    """
+    def __init__(self, app, cache_size=64 * 1024 * 1024):
+        self.app = app
+        self.cache_size = cache_size
+        self._bundles = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def _cache(self, content_hash, bundle):
+        # Callers hold self._lock
+        if content_hash in self._bundles:
+            self._bundles.move_to_end(content_hash)
+            return
+        self._bundles[content_hash] = bundle
+        self._cached_bytes += len(bundle)
+        while self._cached_bytes > self.cache_size and len(self._bundles) > 1:
+            _, evicted = self._bundles.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def capture(self, automation, config_id, dashboard_ids, source_space_id='default',
+                source_data_view=DEFAULT_SOURCE_DATA_VIEW):
+        """
+        Export dashboards and store each one as a new template version when its content changed
+
+        Args:
+            automation (ElasticAutomation): Client to export with
+            config_id (int): Configuration the templates belong to
+            dashboard_ids (list): Dashboards to capture
+            source_space_id (str): Space to export from
+            source_data_view (str): Data view name the dashboards use in the source space
+
+        Returns:
+            dict: Overall status and one result per dashboard with its version,
+                content hash and whether it was created or unchanged
+        """
+        results = []
+        for dashboard_id in dashboard_ids:
+            try:
+                with automation.export_dashboard_bundle(dashboard_id, source_space_id) as exported:
+                    bundle = b"".join(exported.lines())
+                    object_count = exported.count
+                results.append(self._store(config_id, dashboard_id, bundle, object_count, source_space_id,
+                                           source_data_view))
+            except Exception as e:
+                results.append({"dashboard_id": dashboard_id, "status": "error", "message": str(e)})
+
+        failed = sum(1 for result in results if result["status"] == "error")
+        if not failed:
+            status = "success"
+        elif failed == len(results):
+            status = "error"
+        else:
+            status = "partial"
+        return {"status": status, "message": f"Captured {len(results) - failed} of {len(results)} dashboards",
+                "results": results}
+
+    def _store(self, config_id, dashboard_id, bundle, object_count, source_space_id, source_data_view):
+        content_hash = bundle_hash(bundle.splitlines())
+        with self.app.app_context():
+            latest = (DashboardTemplate.query
+                      .filter_by(config_id=config_id, dashboard_id=dashboard_id)
+                      .order_by(DashboardTemplate.version.desc())
+                      .first())
+            if (latest is not None and latest.content_hash == content_hash
+                    and latest.source_data_view == source_data_view):
+                return dict(latest.to_dict(), status="unchanged", message="Template is up to date")
+
+            template = DashboardTemplate(
+                config_id=config_id,
+                dashboard_id=dashboard_id,
+                title=dashboard_title(bundle, dashboard_id),
+                version=(latest.version + 1) if latest else 1,
+                content_hash=content_hash,
+                source_space_id=source_space_id,
+                source_data_view=source_data_view,
+                object_count=object_count,
+                size=len(bundle),
+                bundle=bundle
+            )
+            db.session.add(template)
+            db.session.commit()
+            logger.info("Captured dashboard template", extra={"fields": {
+                "dashboard_id": dashboard_id, "version": template.version, "content_hash": content_hash}})
+            return dict(template.to_dict(), status="success", message="Template captured")
+
+    def list(self, config_id, dashboard_id=None):
+        """
+        Every stored version of the templates of a configuration, newest first
+
+        Returns:
+            list: Template dicts, without their bundles
+        """
+        with self.app.app_context():
+            query = DashboardTemplate.query.filter_by(config_id=config_id)
+            if dashboard_id:
+                query = query.filter_by(dashboard_id=dashboard_id)
+            templates = query.order_by(DashboardTemplate.dashboard_id, DashboardTemplate.version.desc())
+            return [template.to_dict() for template in templates]
+
+    def latest(self, config_id, dashboard_ids=None):
+        """
+        Newest version of each template of a configuration, ready for fan_out_dashboards
+
+        Args:
+            config_id (int): Configuration the templates belong to
+            dashboard_ids (list): Dashboards wanted, all of the configuration when None
+
+        Returns:
+            dict: {"bundle", "source_data_view", "version", "content_hash"} keyed by dashboard ID
+        """
+        with self.app.app_context():
+            newest = (db.session.query(DashboardTemplate.dashboard_id, func.max(DashboardTemplate.version).label('version'))
+                      .filter(DashboardTemplate.config_id == config_id)
+                      .group_by(DashboardTemplate.dashboard_id))
+            if dashboard_ids:
+                newest = newest.filter(DashboardTemplate.dashboard_id.in_(list(dashboard_ids)))
+            newest = newest.subquery()
+
+            rows = (db.session.query(DashboardTemplate.id, DashboardTemplate.dashboard_id, DashboardTemplate.version,
+                                     DashboardTemplate.content_hash, DashboardTemplate.source_data_view)
+                    .join(newest, (DashboardTemplate.dashboard_id == newest.c.dashboard_id)
+                          & (DashboardTemplate.version == newest.c.version))
+                    .filter(DashboardTemplate.config_id == config_id)
+                    .all())
+
+            # Only the bundles not in memory are read from the database
+            bundles = {}
+            with self._lock:
+                for row in rows:
+                    if row.content_hash in self._bundles:
+                        self._bundles.move_to_end(row.content_hash)
+                        bundles[row.content_hash] = self._bundles[row.content_hash]
+            missing = [row.id for row in rows if row.content_hash not in bundles]
+            if missing:
+                loaded = (db.session.query(DashboardTemplate.content_hash, DashboardTemplate.bundle)
+                          .filter(DashboardTemplate.id.in_(missing)))
+                with self._lock:
+                    for content_hash, bundle in loaded:
+                        bundles[content_hash] = bundle
+                        self._cache(content_hash, bundle)
+
+        return {
+            row.dashboard_id: {
+                "bundle": bundles[row.content_hash],
+                "source_data_view": row.source_data_view,
+                "version": row.version,
+                "content_hash": row.content_hash
+            }
+            for row in rows
+        }
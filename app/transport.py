@@ -0,0 +1,245 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.metrics import operation_names
+
+# Header and body fields never written to a cassette
+REDACTED_HEADERS = frozenset(["authorization", "cookie", "set-cookie", "es-secondary-authorization"])
+REDACTED_FIELDS = frozenset(["password", "passwd", "api_key", "token", "secret", "es_pass"])
+REDACTED = "[REDACTED]"
+
+# Response headers kept in a cassette, the ones the client reads
+RECORDED_RESPONSE_HEADERS = ("Content-Type", "Retry-After")
+
+class CassetteMissError(Exception):
+    """
+    Raised when a replayed request has no recorded exchange
+    """
+
+def base_url(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def request_key(method, url, params=None, body=None):
+    """
+    Host-independent key of a request: method, path, sorted query string and,
+    for JSON bodies, a digest of the body, so two exports of different
+    dashboards are told apart
+    """
+    parts = urlsplit(url)
+    query = sorted(part for part in parts.query.split("&") if part)
+    if params:
+        query = sorted(query + urlencode(params, doseq=True).split("&"))
+    key = f"{method.upper()} {parts.path}{'?' + '&'.join(query) if query else ''}"
+    if isinstance(body, (dict, list)):
+        key += " " + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return key
+
+def recorded_body(kwargs):
+    """
+    Body of a request as written to a cassette: redacted JSON when it parses, text otherwise
+    """
+    if kwargs.get('json') is not None:
+        return redact(kwargs['json'])
+    data = kwargs.get('data')
+    if not isinstance(data, (bytes, str)):
+        return None
+    text = data.decode('utf-8', 'replace') if isinstance(data, bytes) else data
+    try:
+        return redact(json.loads(text))
+    except ValueError:
+        return text
+
+def redact(value):
+    """
+    Copy of a decoded JSON body with credential fields masked
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+class SessionTransport:
+    """
+    Default transport: one pooled requests.Session per base URL
+
+    Connections are kept alive, so the TLS handshake is paid once per pooled
+    socket instead of once per call.
+    """
+    def __init__(self, auth, verify=True, pool_connections=4, pool_maxsize=10, keep_alive=True):
+        self.auth = auth
+        self.verify = verify
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        key = base_url(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                session.auth = self.auth
+                session.verify = self.verify
+                if not self.keep_alive:
+                    session.headers['Connection'] = 'close'
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount(key, adapter)
+                self._sessions[key] = session
+            return session
+
+    def send(self, method, url, **kwargs):
+        return self._session(url).request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Close every pooled session and release its connections
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+class OperationCounter:
+    """
+    HTTP requests per ElasticAutomation operation
+
+    A request counts toward every operation running when it is sent, so
+    counts["copy_dashboard_between_spaces"] includes the export and import
+    calls it makes through nested operations.
+    """
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.counts.update(set(operation_names()) or [""])
+
+    def requests_for(self, operation):
+        return self.counts[operation]
+
+class RecordingTransport(OperationCounter):
+    """
+    Send requests through another transport and record each exchange
+
+    Authorization headers and credential fields of JSON bodies are redacted.
+    Streamed bodies are read into memory before sending so they can be
+    recorded. save() writes the cassette as JSON lines.
+
+    Args:
+        transport: Transport that actually sends, a SessionTransport usually
+    """
+    def __init__(self, transport):
+        super().__init__()
+        self.transport = transport
+        self.interactions = []
+
+    def send(self, method, url, **kwargs):
+        data = kwargs.get('data')
+        if data is not None and not isinstance(data, (bytes, str, dict, list, tuple)):
+            kwargs['data'] = b"".join(data)
+
+        self.count()
+        response = self.transport.send(method, url, **kwargs)
+        if kwargs.get('stream'):
+            # Read it now so the cassette has the body; the caller still iterates it
+            response.content
+
+        headers = {name: REDACTED if name.lower() in REDACTED_HEADERS else value
+                   for name, value in (kwargs.get('headers') or {}).items()}
+        body = recorded_body(kwargs)
+        self.interactions.append({
+            "operations": operation_names(),
+            "request": {
+                "key": request_key(method, url, kwargs.get('params'), body),
+                "headers": headers,
+                "body": body,
+            },
+            "response": {
+                "status": response.status_code,
+                "headers": {name: response.headers[name] for name in RECORDED_RESPONSE_HEADERS
+                            if name in response.headers},
+                "body": response.content.decode('utf-8', 'replace'),
+            },
+        })
+        return response
+
+    def save(self, path):
+        """
+        Write the recorded exchanges to a cassette file, one JSON object per line
+        """
+        with open(path, 'w', encoding='utf-8') as cassette:
+            for interaction in self.interactions:
+                cassette.write(json.dumps(interaction) + "\n")
+
+    def close(self):
+        self.transport.close()
+
+class ReplayTransport(OperationCounter):
+    """
+    Answer requests from a cassette without any network access
+
+    Exchanges are matched on method, path, query string and JSON body,
+    ignoring the host; repeated requests get the recorded answers in order,
+    and the last one again once they run out.
+
+    Args:
+        cassette (str|list): Path of a cassette file, or its interactions
+        latency (float): Seconds slept before answering, to mimic a cluster
+    """
+    def __init__(self, cassette, latency=0.0):
+        super().__init__()
+        if isinstance(cassette, str):
+            with open(cassette, encoding='utf-8') as lines:
+                cassette = [json.loads(line) for line in lines if line.strip()]
+        self.latency = latency
+        self._answers = defaultdict(deque)
+        self._last = {}
+        for interaction in cassette:
+            self._answers[interaction["request"]["key"]].append(interaction["response"])
+        self._answers_lock = threading.Lock()
+
+    def send(self, method, url, **kwargs):
+        data = kwargs.get('data')
+        if data is not None and not isinstance(data, (bytes, str, dict, list, tuple)):
+            # Drain streamed bodies as a real upload would
+            for _ in data:
+                pass
+
+        self.count()
+        key = request_key(method, url, kwargs.get('params'), recorded_body(kwargs))
+        with self._answers_lock:
+            answers = self._answers.get(key)
+            if answers:
+                self._last[key] = answers.popleft()
+            recorded = self._last.get(key)
+        if recorded is None:
+            raise CassetteMissError(f"No recorded response for {key}")
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response._content = recorded["body"].encode('utf-8')
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,376 @@
+"""
+In-memory stand-in for the Elasticsearch and Kibana endpoints used by ElasticAutomation
+
+A single HTTP server answers both the Elasticsearch and the Kibana calls, so a
+client pointed at it with scheme="http" and the same host and port for both
+runs unchanged. Latency and error injection apply to every request.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Dashboards seeded in the default space, one visualization each, all on the source data view
+SEED_DASHBOARD_IDS = [
+    "3a81edc6-40d2-435a-87a3-41ce352a523d",
+    "5b898e8b-12e9-4638-acf3-34fea03e7b61",
+    "e1f0588e-41fd-45b8-8160-e334b866f2f7"
+]
+SEED_DATA_VIEW = {"id": "dguard-demo", "name": "DGuard Demo", "title": "dguard-analytics-events-demo"}
+
+class FakeCluster:
+    """
+    Fake Elasticsearch/Kibana server with in-memory state
+
+    Args:
+        latency (float): Seconds added to every request
+        error_rate (float): Fraction of requests answered with a 503
+        seed (bool): Create the default dashboards and source data view
+        regenerate_ids (bool): Give imported objects a new ID when theirs is
+            taken in another space, keeping the source ID as originId, as Kibana 8 does
+        max_result_window (int): Largest page * per_page _find accepts, as the .kibana index's
+    """
+    def __init__(self, latency=0.0, error_rate=0.0, seed=True, regenerate_ids=False, max_result_window=10000):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.regenerate_ids = regenerate_ids
+        self.max_result_window = max_result_window
+        self.lock = threading.Lock()
+        self.aliases = {}
+        self.roles = {}
+        self.users = {}
+        self.spaces = {"default": {"id": "default", "name": "Default", "description": "", "disabledFeatures": []}}
+        self.objects = {}
+        self.requests = []
+        self._server = None
+        if seed:
+            self.seed()
+
+    def seed(self):
+        data_view = SEED_DATA_VIEW
+        self.objects[("default", "index-pattern", data_view["id"])] = {
+            "type": "index-pattern", "id": data_view["id"],
+            "attributes": {"title": data_view["title"], "name": data_view["name"]}, "references": []
+        }
+        for number, dashboard_id in enumerate(SEED_DASHBOARD_IDS):
+            visualization_id = f"visualization-{number}"
+            self.objects[("default", "visualization", visualization_id)] = {
+                "type": "visualization", "id": visualization_id, "attributes": {"title": f"Visualization {number}"},
+                "references": [{"type": "index-pattern", "id": data_view["id"],
+                                "name": "kibanaSavedObjectMeta.searchSourceJSON.index"}]
+            }
+            self.objects[("default", "dashboard", dashboard_id)] = {
+                "type": "dashboard", "id": dashboard_id, "attributes": {"title": f"Dashboard {number}"},
+                "references": [{"type": "visualization", "id": visualization_id, "name": "panel_0"}]
+            }
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Serve on a background thread and return the bound port
+        """
+        handler = type("Handler", (FakeClusterHandler,), {"cluster": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.port
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset_requests(self):
+        with self.lock:
+            self.requests = []
+
+def _multipart_file(body, content_type):
+    # The one part Kibana's _import reads is the "file" field
+    boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode()
+    for part in body.split(b"--" + boundary):
+        headers, _, content = part.partition(b"\r\n\r\n")
+        if b'name="file"' in headers:
+            return content[:-2] if content.endswith(b"\r\n") else content
+    return b""
+
+class FakeClusterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cluster = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method):
+        started = time.perf_counter()
+        cluster = self.cluster
+        body = self._read_body()
+        url = urlparse(self.path)
+        path = url.path
+
+        if cluster.latency:
+            time.sleep(cluster.latency)
+        if cluster.error_rate and random.random() < cluster.error_rate:
+            status, payload, content_type = 503, {"error": "Service Unavailable"}, "application/json"
+        else:
+            space = "default"
+            match = re.match(r"^/s/([^/]+)(/.*)$", path)
+            if match:
+                space, path = match.group(1), match.group(2)
+            with cluster.lock:
+                status, payload, content_type = self._route(method, path, space, parse_qs(url.query), body)
+        self._send(status, payload, content_type)
+
+        with cluster.lock:
+            cluster.requests.append({"method": method, "path": url.path, "status": status,
+                                     "duration": time.perf_counter() - started})
+
+    def _route(self, method, path, space, query, body):
+        cluster = self.cluster
+        json_type = "application/json"
+
+        if space not in cluster.spaces:
+            return 404, {"statusCode": 404, "error": "Not Found", "message": f"Space {space} not found"}, json_type
+
+        if path == "/_aliases" and method == "POST":
+            for action in json.loads(body)["actions"]:
+                (kind, spec), = action.items()
+                if kind == "add":
+                    cluster.aliases.setdefault(spec["alias"], {})[spec["index"]] = {"filter": spec.get("filter")}
+                elif kind == "remove":
+                    if spec["alias"] not in cluster.aliases and spec.get("must_exist", True):
+                        return 404, {"error": {"type": "aliases_not_found_exception"}}, json_type
+                    cluster.aliases.pop(spec["alias"], None)
+            return 200, {"acknowledged": True}, json_type
+
+        if path == "/_alias" and method == "GET":
+            indices = {}
+            for alias, specs in cluster.aliases.items():
+                for index, spec in specs.items():
+                    indices.setdefault(index, {"aliases": {}})["aliases"][alias] = spec
+            return 200, indices, json_type
+
+        match = re.match(r"^/_alias/(.+)$", path)
+        if match and method == "GET":
+            alias = match.group(1)
+            if alias not in cluster.aliases:
+                return 404, {"error": f"alias [{alias}] missing", "status": 404}, json_type
+            return 200, {index: {"aliases": {alias: spec}} for index, spec in cluster.aliases[alias].items()}, json_type
+
+        for collection, store in (("role", cluster.roles), ("user", cluster.users)):
+            if path == f"/_security/{collection}" and method == "GET":
+                return 200, store, json_type
+            match = re.match(rf"^/_security/{collection}/(.+)$", path)
+            if match:
+                name = match.group(1)
+                if method == "GET":
+                    if name not in store:
+                        return 404, {}, json_type
+                    return 200, {name: store[name]}, json_type
+                if method == "PUT":
+                    payload = json.loads(body)
+                    if collection == "user":
+                        store[name] = {"username": name, "roles": payload.get("roles", []),
+                                       "full_name": payload.get("full_name"), "enabled": True, "metadata": {}}
+                    else:
+                        store[name] = {"indices": payload.get("indices", []),
+                                       "applications": payload.get("applications", []), "metadata": {}}
+                    return 200, {"created": True}, json_type
+                if method == "DELETE":
+                    if store.pop(name, None) is None:
+                        return 404, {"found": False}, json_type
+                    return 200, {"found": True}, json_type
+
+        if path == "/api/security/role" and method == "GET":
+            return 200, [{"name": name, "elasticsearch": {"indices": role["indices"]}, "metadata": role["metadata"]}
+                         for name, role in cluster.roles.items()], json_type
+
+        if path == "/api/features" and method == "GET":
+            return 200, [{"id": "dashboard"}, {"id": "discover"}, {"id": "visualize"}], json_type
+
+        if path == "/api/spaces/space":
+            if method == "GET":
+                return 200, list(cluster.spaces.values()), json_type
+            payload = json.loads(body)
+            if payload["id"] in cluster.spaces:
+                return 409, {"statusCode": 409, "error": "Conflict",
+                             "message": f"A space with the identifier {payload['id']} already exists."}, json_type
+            cluster.spaces[payload["id"]] = payload
+            return 200, payload, json_type
+
+        match = re.match(r"^/api/spaces/space/(.+)$", path)
+        if match and method == "GET":
+            if match.group(1) not in cluster.spaces:
+                return 404, {"statusCode": 404, "error": "Not Found"}, json_type
+            return 200, cluster.spaces[match.group(1)], json_type
+        if match and method == "DELETE":
+            space_id = match.group(1)
+            if cluster.spaces.pop(space_id, None) is None:
+                return 404, {"statusCode": 404, "error": "Not Found"}, json_type
+            for key in [key for key in cluster.objects if key[0] == space_id]:
+                del cluster.objects[key]
+            return 204, b"", json_type
+
+        if path == "/api/data_views" and method == "GET":
+            data_views = [{"id": saved_object["id"], "name": saved_object["attributes"].get("name"),
+                           "title": saved_object["attributes"]["title"], "namespaces": [space]}
+                          for (object_space, object_type, _), saved_object in cluster.objects.items()
+                          if object_space == space and object_type == "index-pattern"]
+            return 200, {"data_view": data_views}, json_type
+
+        if path == "/api/data_views/data_view" and method == "POST":
+            data_view = json.loads(body)["data_view"]
+            for (object_space, object_type, _), saved_object in cluster.objects.items():
+                if (object_space == space and object_type == "index-pattern"
+                        and saved_object["attributes"].get("name") == data_view["name"]):
+                    return 400, {"statusCode": 400, "message": f"Duplicate data view: {data_view['name']}"}, json_type
+            data_view_id = data_view.get("id") or str(uuid.uuid4())
+            cluster.objects[(space, "index-pattern", data_view_id)] = {
+                "type": "index-pattern", "id": data_view_id,
+                "attributes": {"title": data_view["title"], "name": data_view["name"]}, "references": []
+            }
+            return 200, {"data_view": dict(data_view, id=data_view_id)}, json_type
+
+        if path == "/api/saved_objects/_export" and method == "POST":
+            return 200, self._export(space, json.loads(body)), "application/ndjson"
+
+        if path == "/api/saved_objects/_import" and method == "POST":
+            content = _multipart_file(body, self.headers.get("Content-Type", ""))
+            imported = [json.loads(line) for line in content.splitlines() if line.strip()]
+            imported = [saved_object for saved_object in imported if "exportedCount" not in saved_object]
+
+            destinations = {(saved_object["type"], saved_object["id"]): self._destination_id(space, saved_object)
+                            for saved_object in imported}
+            results = []
+            for saved_object in imported:
+                key = (saved_object["type"], saved_object["id"])
+                saved_object = dict(saved_object, id=destinations[key], references=[
+                    dict(ref, id=destinations.get((ref["type"], ref["id"])) or self._destination_id(space, ref, create=False))
+                    for ref in saved_object.get("references", [])
+                ])
+                if destinations[key] != key[1]:
+                    saved_object["originId"] = key[1]
+                cluster.objects[(space, saved_object["type"], saved_object["id"])] = saved_object
+                results.append({"type": key[0], "id": key[1], "destinationId": destinations[key]})
+            return 200, {"success": True, "successCount": len(results), "successResults": results}, json_type
+
+        if path == "/api/saved_objects/_find" and method == "GET":
+            types = query.get("type", [])
+            namespaces = query.get("namespaces") or [space]
+            per_page = int(query.get("per_page", ["20"])[0])
+            page = int(query.get("page", ["1"])[0])
+            if page * per_page > cluster.max_result_window:
+                return 400, {"statusCode": 400, "error": "Bad Request",
+                             "message": f"Result window is too large, page * per_page must be less than or equal to "
+                                        f"{cluster.max_result_window}"}, json_type
+            matches = [dict(saved_object, namespaces=[object_space])
+                       for (object_space, object_type, _), saved_object in sorted(cluster.objects.items())
+                       if object_type in types and ("*" in namespaces or object_space in namespaces)]
+            return 200, {"page": page, "per_page": per_page, "total": len(matches),
+                         "saved_objects": matches[(page - 1) * per_page:page * per_page]}, json_type
+
+        match = re.match(r"^/api/saved_objects/([^/_][^/]*)/(.+)$", path)
+        if match:
+            key = (space, match.group(1), match.group(2))
+            if key not in cluster.objects:
+                return 404, {"statusCode": 404, "error": "Not Found"}, json_type
+            if method == "GET":
+                return 200, cluster.objects[key], json_type
+            if method == "PUT":
+                cluster.objects[key].update(json.loads(body))
+                return 200, cluster.objects[key], json_type
+            if method == "DELETE":
+                del cluster.objects[key]
+                return 200, {}, json_type
+
+        return 404, {"error": f"No handler for {method} {path}"}, json_type
+
+    def _destination_id(self, space, saved_object, create=True):
+        # ID an imported object (or a reference to one) ends up with in a space
+        cluster = self.cluster
+        object_type, object_id = saved_object["type"], saved_object["id"]
+        if not cluster.regenerate_ids:
+            return object_id
+        for (object_space, existing_type, existing_id), existing in cluster.objects.items():
+            if (object_space == space and existing_type == object_type
+                    and (existing.get("originId") or existing_id) == object_id):
+                return existing_id
+        if not create:
+            return object_id
+        taken = any(existing_type == object_type and existing_id == object_id
+                    for (_, existing_type, existing_id) in cluster.objects)
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{space}/{object_type}/{object_id}")) if taken else object_id
+
+    def _export(self, space, payload):
+        cluster = self.cluster
+        seen, exported = set(), []
+
+        def collect(object_type, object_id):
+            if (object_type, object_id) in seen:
+                return
+            saved_object = cluster.objects.get((space, object_type, object_id))
+            if saved_object is None:
+                return
+            seen.add((object_type, object_id))
+            if payload.get("includeReferencesDeep"):
+                for reference in saved_object.get("references", []):
+                    collect(reference["type"], reference["id"])
+            exported.append(saved_object)
+
+        specs = payload.get("objects") or [{"type": object_type, "id": object_id}
+                                           for (object_space, object_type, object_id) in cluster.objects
+                                           if object_space == space and object_type in payload.get("type", [])]
+        for spec in specs:
+            collect(spec["type"], spec["id"])
+
+        lines = [json.dumps(saved_object) for saved_object in exported]
+        if not payload.get("excludeExportDetails"):
+            lines.append(json.dumps({"exportedCount": len(exported), "missingRefCount": 0, "missingReferences": []}))
+        return ("\n".join(lines) + "\n").encode()
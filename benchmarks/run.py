@@ -0,0 +1,153 @@
+"""
+Tenant onboarding throughput against the FakeCluster stand-in
+
+Onboards N tenants (alias, space, role, user, data view and the default
+dashboards) through the library, through the Flask routes, or both, and
+reports tenants/sec, requests per tenant and p50/p99 latencies.
+
+    python -m benchmarks.run --tenants 50 --workers 8 --latency 0.01 --error-rate 0.01
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Read by the app at import time: plain http to the stand-in, a throwaway
+# database and quiet logs unless asked otherwise
+os.environ.setdefault("ELASTIC_SCHEME", "http")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='benchmark-'), 'benchmark.db')}")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app import app, db, dashboardMigration  # noqa: E402
+from app.models import Configuration  # noqa: E402
+from benchmarks.fake_cluster import FakeCluster, SEED_DATA_VIEW  # noqa: E402
+
+STEPS = [name for name, _ in dashboardMigration.TENANT_STEPS]
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def endpoint(path):
+    # Group per-tenant URLs, e.g. /s/client_7_space/api/... -> /s/{space}/api/...
+    parts = path.split("/")
+    if len(parts) > 2 and parts[1] == "s":
+        parts[2] = "{space}"
+    if len(parts) > 3 and parts[1] == "_security":
+        parts[3] = "{name}"
+    return "/".join(parts)
+
+def onboard_with_library(automation, client_id, config_id):
+    started = time.perf_counter()
+    operations = dashboardMigration.onboard_tenant(automation, client_id, SEED_DATA_VIEW["title"],
+                                                   f"Tenant {client_id}", STEPS, config_id=config_id)
+    failed = any(dashboardMigration.step_failed(operation["result"]) for operation in operations)
+    return time.perf_counter() - started, failed
+
+def onboard_with_routes(client, client_id, config_id, poll_interval=0.01):
+    started = time.perf_counter()
+    response = client.post("/run_automation", json={
+        "config_id": config_id, "client_id": client_id, "space_name": f"Tenant {client_id}",
+        **{name: True for name in STEPS}
+    })
+    job_id = response.get_json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] in ("finished", "failed"):
+            break
+        time.sleep(poll_interval)
+    failed = job["status"] == "failed" or any(
+        dashboardMigration.step_failed(result) for result in job.get("results") or [])
+    return time.perf_counter() - started, failed
+
+def run(mode, tenants, workers, latency, error_rate, first_client_id, regenerate_ids=False):
+    """
+    Onboard tenants against a fresh FakeCluster and collect the measurements
+
+    Args:
+        mode (str): "library" or "routes"
+        tenants (int): Number of tenants to onboard
+        workers (int): Tenants onboarded at the same time
+        latency (float): Seconds the stand-in adds to every request
+        error_rate (float): Fraction of requests the stand-in answers with a 503
+        first_client_id (int): Client ID of the first tenant
+        regenerate_ids (bool): Give imported objects new IDs, as Kibana 8 does
+
+    Returns:
+        dict: Measurements of the run
+    """
+    with FakeCluster(latency=latency, error_rate=error_rate, regenerate_ids=regenerate_ids) as cluster:
+        with app.app_context():
+            config = Configuration(config_name=f"benchmark-{cluster.port}", es_url="127.0.0.1",
+                                   es_port=str(cluster.port), kb_url="127.0.0.1", kb_port=str(cluster.port),
+                                   es_user="benchmark", es_pass="benchmark", es_index_name=SEED_DATA_VIEW["title"])
+            db.session.add(config)
+            db.session.commit()
+            config_id = config.config_id
+
+        client_ids = range(first_client_id, first_client_id + tenants)
+        started = time.perf_counter()
+        if mode == "library":
+            with dashboardMigration.ElasticAutomation("127.0.0.1", cluster.port, "127.0.0.1", cluster.port,
+                                                      "benchmark", "benchmark", scheme="http") as automation:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    outcomes = list(executor.map(lambda client_id: onboard_with_library(automation, client_id, config_id),
+                                                 client_ids))
+        else:
+            app.config["LOGIN_DISABLED"] = True
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(lambda client_id: onboard_with_routes(app.test_client(), client_id, config_id),
+                                             client_ids))
+        elapsed = time.perf_counter() - started
+
+        requests = list(cluster.requests)
+
+    durations = [duration for duration, _ in outcomes]
+    request_durations = [request["duration"] for request in requests]
+    return {
+        "mode": mode,
+        "tenants": tenants,
+        "failed": sum(failed for _, failed in outcomes),
+        "elapsed": elapsed,
+        "tenants_per_second": tenants / elapsed if elapsed else 0.0,
+        "requests_per_tenant": len(requests) / tenants,
+        "tenant_p50": percentile(durations, 0.5),
+        "tenant_p99": percentile(durations, 0.99),
+        "request_p50": percentile(request_durations, 0.5),
+        "request_p99": percentile(request_durations, 0.99),
+        "endpoints": Counter(f"{request['method']} {endpoint(request['path'])}" for request in requests),
+        "errors": sum(request["status"] >= 500 for request in requests),
+    }
+
+def report(result):
+    tenants = result["tenants"]
+    print(f"\n== {result['mode']}: {tenants} tenants, {result['failed']} failed, {result['elapsed']:.2f}s")
+    print(f"tenants/sec          {result['tenants_per_second']:.2f}")
+    print(f"requests per tenant  {result['requests_per_tenant']:.1f} ({result['errors']} answered 5xx)")
+    print(f"tenant latency       p50 {result['tenant_p50'] * 1000:.1f} ms  p99 {result['tenant_p99'] * 1000:.1f} ms")
+    print(f"request latency      p50 {result['request_p50'] * 1000:.1f} ms  p99 {result['request_p99'] * 1000:.1f} ms")
+    for name, count in result["endpoints"].most_common():
+        print(f"  {count / tenants:6.2f}/tenant  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tenant onboarding against a fake Elasticsearch/Kibana")
+    parser.add_argument("--tenants", type=int, default=20, help="Tenants onboarded per run")
+    parser.add_argument("--workers", type=int, default=4, help="Tenants onboarded at the same time")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake requests answered with a 503")
+    parser.add_argument("--mode", choices=["library", "routes", "both"], default="both")
+    parser.add_argument("--regenerate-ids", action="store_true",
+                        help="Give imported objects new IDs with originId, as Kibana 8 does")
+    args = parser.parse_args()
+
+    modes = ["library", "routes"] if args.mode == "both" else [args.mode]
+    for number, mode in enumerate(modes):
+        report(run(mode, args.tenants, args.workers, args.latency, args.error_rate,
+                   first_client_id=1 + number * args.tenants, regenerate_ids=args.regenerate_ids))
+
+if __name__ == "__main__":
+    main()
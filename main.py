@@ -1,12 +1,288 @@
+import argparse
+import csv
+import io
+import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import urllib3
-from  app import dashboardMigration
+from  app import asyncAutomation, dashboardMigration
+from app.resilience import RateLimiter
 
 # Suppress only InsecureRequestWarning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+DEFAULT_INDEX = "dguard-analytics-events-demo"
+
+def read_tenants(source, file_format="auto"):
+    """
+    Read tenants from a CSV or JSONL file, or from stdin when source is "-"
+
+    Each tenant has a client_id and optionally space_name, index and
+    dashboards (a list in JSONL, separated by ";" in CSV).
+
+    Args:
+        source (str): File path or "-"
+        file_format (str): csv, jsonl or auto (by extension, or by content for stdin)
+
+    Returns:
+        list: Tenant dicts
+    """
+    text = sys.stdin.read() if source == "-" else open(source, encoding="utf-8-sig").read()
+    if file_format == "auto":
+        if source.endswith((".jsonl", ".ndjson", ".json")) or text.lstrip().startswith("{"):
+            file_format = "jsonl"
+        else:
+            file_format = "csv"
+
+    if file_format == "jsonl":
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = [row for row in csv.DictReader(io.StringIO(text)) if any(row.values())]
+
+    tenants = []
+    for row in rows:
+        if not row.get("client_id"):
+            raise ValueError(f"Tenant without client_id: {row}")
+        dashboards = row.get("dashboards") or None
+        if isinstance(dashboards, str):
+            dashboards = [dashboard.strip() for dashboard in dashboards.split(";") if dashboard.strip()]
+        tenants.append({
+            "client_id": row["client_id"],
+            "space_name": row.get("space_name") or f'client_{row["client_id"]} Space',
+            "index": row.get("index") or None,
+            "dashboards": dashboards,
+        })
+    return tenants
+
+def build_automation(args):
+    # Enough connections per host for every request the workers may have in flight
+    max_concurrency = max(32, args.concurrency * 4)
+
+    if args.config_id:
+        from app import app, db
+        from app.models import Configuration
+        from app.templateStore import TemplateStore
+
+        with app.app_context():
+            config = db.session.get(Configuration, args.config_id)
+            if config is None:
+                raise SystemExit(f"Configuration {args.config_id} not found")
+            # Dashboards captured for the configuration are copied from the store
+            return dashboardMigration.ElasticAutomation.from_configuration(config, scheme=args.scheme,
+                                                                           template_store=TemplateStore(app),
+                                                                           max_concurrency=max_concurrency,
+                                                                           pool_maxsize=max_concurrency)
+
+    return dashboardMigration.ElasticAutomation(
+        elastic_host=args.es_host,
+        elastic_port=args.es_port,
+        kibana_host=args.kb_host or args.es_host,
+        kibana_port=args.kb_port,
+        username=args.user,
+        password=args.password,
+        verify_ssl=not args.insecure,
+        scheme=args.scheme,
+        max_concurrency=max_concurrency,
+        pool_maxsize=max_concurrency
+    )
+
+def onboard(args):
+    """
+    Onboard every tenant of the input with bounded concurrency and an optional
+    rate limit, writing one JSON line per tenant as it finishes and a throughput
+    summary to stderr at the end
+    """
+    tenants = read_tenants(args.tenants, args.format)
+    steps = [name for name, _ in dashboardMigration.TENANT_STEPS if name not in args.skip]
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    rate_limiter = RateLimiter(args.rate)
+
+    step_journal = None
+    completed = {}
+    if args.journal or args.resume:
+        from app import app
+        from app.journal import JournalWriter
+
+        step_journal = JournalWriter(app)
+        if args.resume:
+            # One query for the whole batch instead of one per tenant
+            completed = step_journal.completed(args.config_id, [tenant["client_id"] for tenant in tenants])
+
+    with build_automation(args) as automation:
+        started = time.perf_counter()
+
+        # Aliases of all tenants go out in bulk, one _aliases request per chunk per index
+        alias_results = {}
+        if "create_index_alias" in steps:
+            by_index = {}
+            for tenant in tenants:
+                if "create_index_alias" in completed.get(str(tenant["client_id"]), ()):
+                    continue
+                by_index.setdefault(tenant["index"] or args.index, {})[tenant["client_id"]] = f'client_{tenant["client_id"]}_alias'
+            for index_pattern, aliases in by_index.items():
+                for result in automation.create_index_aliases(index_pattern, aliases):
+                    alias_results[result["client_id"]] = {"status": result["status"], "message": result["message"]}
+                    if step_journal is not None:
+                        step_journal.record(args.config_id, result["client_id"], "create_index_alias",
+                                            result["status"], response=alias_results[result["client_id"]])
+
+        def run(tenant):
+            tenant_completed = completed.get(str(tenant["client_id"]), set())
+            if set(steps) <= tenant_completed:
+                # Nothing left to do for this tenant, don't spend rate limit on it
+                return {"client_id": tenant["client_id"], "status": "success", "duration": 0.0, "results": [
+                    {"operation": name, "result": {"status": "success", "message": "Completed in an earlier run"}}
+                    for name in steps
+                ]}
+            rate_limiter.wait()
+            tenant_started = time.perf_counter()
+            operations = dashboardMigration.onboard_tenant(
+                automation,
+                client_id=tenant["client_id"],
+                index_pattern=tenant["index"] or args.index,
+                space_name=tenant["space_name"],
+                steps=[name for name in steps if name != "create_index_alias"],
+                config_id=args.config_id,
+                dashboard_ids=tenant["dashboards"],
+                journal=step_journal,
+                completed=tenant_completed
+            )
+            if tenant["client_id"] in alias_results:
+                operations.insert(0, {"operation": "create_index_alias", "result": alias_results[tenant["client_id"]]})
+            elif "create_index_alias" in steps and "create_index_alias" in tenant_completed:
+                operations.insert(0, {"operation": "create_index_alias",
+                                      "result": {"status": "success", "message": "Completed in an earlier run"}})
+            failed = any(dashboardMigration.step_failed(operation["result"]) for operation in operations)
+            return {
+                "client_id": tenant["client_id"],
+                "status": "error" if failed else "success",
+                "duration": round(time.perf_counter() - tenant_started, 3),
+                "results": operations,
+            }
+
+        durations = []
+        failed = 0
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in as_completed([executor.submit(run, tenant) for tenant in tenants]):
+                result = future.result()
+                durations.append(result["duration"])
+                failed += result["status"] != "success"
+                output.write(json.dumps(result, default=str) + "\n")
+                output.flush()
+
+        elapsed = time.perf_counter() - started
+
+    if step_journal is not None:
+        step_journal.close()
+    if output is not sys.stdout:
+        output.close()
+
+    durations.sort()
+    summary = {
+        "tenants": len(tenants),
+        "succeeded": len(tenants) - failed,
+        "failed": failed,
+        "elapsed": round(elapsed, 3),
+        "tenants_per_second": round(len(tenants) / elapsed, 2) if elapsed else None,
+        "p50": durations[len(durations) // 2] if durations else None,
+        "p99": durations[min(len(durations) - 1, int(len(durations) * 0.99))] if durations else None,
+    }
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+    return 1 if failed else 0
+
+def teardown(args):
+    """
+    Remove the alias, user, role and space of every tenant of the input,
+    writing one JSON line per tenant and a summary to stderr
+    """
+    client_ids = [tenant["client_id"] for tenant in read_tenants(args.tenants, args.format)]
+    steps = [name for name in dashboardMigration.TEARDOWN_STEPS if name not in args.skip]
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    step_journal = None
+    if args.journal:
+        from app import app
+        from app.journal import JournalWriter
+
+        step_journal = JournalWriter(app)
+
+    with build_automation(args) as automation:
+        started = time.perf_counter()
+        removed = automation.teardown_tenants(client_ids, steps=steps, max_workers=args.concurrency,
+                                              journal=step_journal, config_id=args.config_id)
+        elapsed = time.perf_counter() - started
+
+    if step_journal is not None:
+        step_journal.close()
+
+    for result in removed["results"]:
+        output.write(json.dumps(result, default=str) + "\n")
+    if output is not sys.stdout:
+        output.close()
+
+    summary = {
+        "tenants": len(client_ids),
+        "succeeded": removed["succeeded"],
+        "failed": removed["failed"],
+        "elapsed": round(elapsed, 3),
+    }
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+    return 1 if removed["failed"] else 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Elastic/Kibana tenant automation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    onboarding = commands.add_parser("onboard", help="Onboard tenants read from a CSV/JSONL file or stdin")
+    onboarding.add_argument("tenants", help="CSV or JSONL file of tenants, or - for stdin")
+    onboarding.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto")
+    onboarding.add_argument("--index", default=DEFAULT_INDEX, help="Index pattern of tenants without one")
+    onboarding.add_argument("--skip", nargs="*", default=[], choices=[name for name, _ in dashboardMigration.TENANT_STEPS],
+                            help="Steps left out")
+    onboarding.add_argument("--concurrency", type=int, default=8, help="Tenants onboarded at the same time")
+    onboarding.add_argument("--rate", type=float, default=0, help="Maximum tenants started per second, 0 for no limit")
+    onboarding.add_argument("--output", default="-", help="JSONL file of per-tenant results, - for stdout")
+    onboarding.add_argument("--journal", action=argparse.BooleanOptionalAction, default=True,
+                            help="Record every step in the step journal of the database")
+    onboarding.add_argument("--resume", action="store_true",
+                            help="Skip the steps the journal records as completed, retrying failed and pending ones")
+    onboarding.set_defaults(handler=onboard)
+
+    removal = commands.add_parser("teardown", help="Remove the artifacts of tenants read from a CSV/JSONL file or stdin")
+    removal.add_argument("tenants", help="CSV or JSONL file of tenants, or - for stdin")
+    removal.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto")
+    removal.add_argument("--skip", nargs="*", default=[], choices=list(dashboardMigration.TEARDOWN_STEPS),
+                         help="Steps left out")
+    removal.add_argument("--concurrency", type=int, default=8, help="Deletes running at the same time")
+    removal.add_argument("--output", default="-", help="JSONL file of per-tenant results, - for stdout")
+    removal.add_argument("--journal", action=argparse.BooleanOptionalAction, default=True,
+                         help="Drop the removed steps from the step journal of the database, so --resume redoes them")
+    removal.set_defaults(handler=teardown)
+
+    for command in commands.choices.values():
+        command.add_argument("--config-id", type=int, help="Stored configuration to connect with")
+        command.add_argument("--es-host", default="prod-mq.seventh.com.br")
+        command.add_argument("--es-port", default="9200")
+        command.add_argument("--kb-host", help="Defaults to --es-host")
+        command.add_argument("--kb-port", default="5601")
+        command.add_argument("--user", default=os.getenv("ELASTIC_USER", "elastic"))
+        command.add_argument("--password", default=os.getenv("ELASTIC_PASSWORD", ""))
+        command.add_argument("--scheme", choices=["https", "http"], default="https")
+        command.add_argument("--insecure", action="store_true", help="Skip TLS certificate verification")
+
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
+    # Subcommands, e.g. "main.py onboard tenants.csv --concurrency 16"; the
+    # client_id / client_ids forms below are kept as they were
+    if len(sys.argv) > 1 and sys.argv[1] not in ("client_id", "client_ids"):
+        args = parse_args(sys.argv[1:])
+        sys.exit(args.handler(args))
+
     elastic_host="prod-mq.seventh.com.br"
     elastic_port="9200"
     kibana_host="prod-mq.seventh.com.br"
@@ -24,6 +300,29 @@ if __name__ == "__main__":
         verify_ssl=False
     )
 
+    # Bulk mode: create the aliases of many tenants, e.g. "client_ids 1,2,3"
+    if len(sys.argv) > 1 and sys.argv[1] == "client_ids":
+        if len(sys.argv) < 3:
+            print("Please provide a comma separated list of client IDs after 'client_ids'")
+            sys.exit(1)
+        client_ids = [int(client_id) for client_id in sys.argv[2].split(",") if client_id]
+        automation.close()
+
+        # Onboard every tenant concurrently from a single event loop
+        async_automation = asyncAutomation.AsyncElasticAutomation(
+            elastic_host=elastic_host,
+            elastic_port=elastic_port,
+            kibana_host=kibana_host,
+            kibana_port=kibana_port,
+            username=username,
+            password=password,
+            verify_ssl=False
+        )
+        with asyncAutomation.SyncFacade(async_automation) as facade:
+            for result in asyncAutomation.onboard_tenants(facade, client_ids, "dguard-analytics-events-demo"):
+                print(result)
+        sys.exit(0)
+
     # Check if client_id parameter exists in the command-line arguments
     if len(sys.argv) > 1 and sys.argv[1] == "client_id":
         # If client_id is provided as an argument, use it instead of client_id
@@ -77,3 +376,5 @@ if __name__ == "__main__":
             source_data_view=source_data_view,
             target_data_view=bi_data_view_name
         ))
+
+    automation.close()
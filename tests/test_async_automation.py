@@ -0,0 +1,26 @@
+"""
+The asyncio engine behind SyncFacade, against the fake cluster
+"""
+import os
+
+# Importing the app creates its tables; keep them out of site.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.asyncAutomation import AsyncElasticAutomation, SyncFacade, onboard_tenants  # noqa: E402
+from app.dashboardMigration import DEFAULT_DASHBOARD_IDS, DEFAULT_SOURCE_DATA_VIEW  # noqa: E402
+from benchmarks.fake_cluster import SEED_DATA_VIEW, FakeCluster  # noqa: E402
+
+def test_onboard_and_copy_dashboard():
+    with FakeCluster(regenerate_ids=True) as cluster:
+        automation = AsyncElasticAutomation("127.0.0.1", cluster.port, "127.0.0.1", cluster.port, "elastic", "secret",
+                                            scheme="http", retries=0)
+        with SyncFacade(automation) as facade:
+            tenants = onboard_tenants(facade, [1, 2], SEED_DATA_VIEW["title"])
+            assert [tenant["status"] for tenant in tenants] == ["success", "success"]
+            assert "client_2_space" in cluster.spaces and "client_2" in cluster.users
+
+            copy = (DEFAULT_DASHBOARD_IDS[0], "default", "client_1_space", DEFAULT_SOURCE_DATA_VIEW, "client_1_data_view")
+            assert facade.copy_dashboard_between_spaces(*copy)["successCount"] > 0
+            # The second copy finds every object up to date and imports nothing
+            assert facade.copy_dashboard_between_spaces(*copy)["successCount"] == 0
@@ -0,0 +1,32 @@
+"""
+Structured logging through the queue listener
+"""
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+from app.logger import JsonFormatter, StructuredQueueHandler
+
+def test_exception_is_a_structured_field():
+    records = queue.SimpleQueue()
+    stream = io.StringIO()
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(records, writer)
+
+    logger = logging.getLogger("tests.logger")
+    logger.propagate = False
+    logger.addHandler(StructuredQueueHandler(records))
+    listener.start()
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Step %s failed", "create_space", extra={"fields": {"client_id": 7}})
+    listener.stop()
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Step create_space failed"
+    assert entry["client_id"] == 7
+    assert entry["exception"].splitlines()[-1] == "ZeroDivisionError: division by zero"
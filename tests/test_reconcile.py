@@ -0,0 +1,51 @@
+"""
+Tenant reconciliation with explicit, empty and default step lists
+"""
+import os
+
+# Importing the app creates its tables; keep them out of site.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.dashboardMigration import RECONCILED_STEPS, ElasticAutomation, plan_tenant  # noqa: E402
+from benchmarks.fake_cluster import FakeCluster  # noqa: E402
+
+INDEX_PATTERN = "dguard-analytics-events-demo"
+EMPTY_INVENTORY = {"aliases": {}, "roles": {}, "users": {}, "spaces": {}, "data_views": {}}
+
+def operations(plan):
+    return [step["operation"] for step in plan]
+
+def test_plan_tenant_steps():
+    assert operations(plan_tenant(8, INDEX_PATTERN, EMPTY_INVENTORY)) == list(RECONCILED_STEPS)
+    assert operations(plan_tenant(8, INDEX_PATTERN, EMPTY_INVENTORY, ["create_space"])) == ["create_space"]
+    assert plan_tenant(8, INDEX_PATTERN, EMPTY_INVENTORY, []) == []
+
+def test_reconcile_tenants_steps():
+    with FakeCluster() as cluster:
+        with ElasticAutomation("127.0.0.1", cluster.port, "127.0.0.1", cluster.port, "elastic", "secret",
+                               scheme="http", retries=0) as client:
+            result = client.reconcile_tenants([8], INDEX_PATTERN, steps=[])
+            assert result["results"][0]["plan"] == []
+            assert "client_8_space" not in cluster.spaces and not cluster.roles and not cluster.aliases
+
+            result = client.reconcile_tenants([8], INDEX_PATTERN, steps=["create_space"])
+            assert operations(result["results"][0]["plan"]) == ["create_space"]
+            assert "client_8_space" in cluster.spaces and not cluster.roles
+
+            result = client.reconcile_tenants([8], INDEX_PATTERN)
+            assert operations(result["results"][0]["plan"]) == [step for step in RECONCILED_STEPS
+                                                                 if step != "create_space"]
+            assert "client_8_role" in cluster.roles and "client_8" in cluster.users
+
+def test_fetch_inventory_past_the_find_window():
+    with FakeCluster(max_result_window=4) as cluster:
+        with ElasticAutomation("127.0.0.1", cluster.port, "127.0.0.1", cluster.port, "elastic", "secret",
+                               scheme="http", retries=0) as client:
+            for client_id in range(1, 6):
+                client.reconcile_tenants([client_id], INDEX_PATTERN)
+            inventory = client.fetch_inventory(per_page=3, max_window=4)
+
+    # The seeded data view of the default space and one per tenant
+    assert len(inventory["data_views"]) == 6
+    assert ("client_5_space", "client_5_data_view") in inventory["data_views"]
@@ -0,0 +1,72 @@
+"""
+Request budgets of the dashboard copy paths, replayed from recorded cassettes
+
+The cassettes were recorded against benchmarks.fake_cluster with
+regenerate_ids on; rerun this module as a script to record them again:
+
+    python -m tests.test_request_budget
+"""
+import os
+
+# Importing the app creates its tables; keep them out of site.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.dashboardMigration import DEFAULT_SOURCE_DATA_VIEW, ElasticAutomation  # noqa: E402
+from app.transport import RecordingTransport, ReplayTransport, SessionTransport  # noqa: E402
+
+CASSETTES = os.path.join(os.path.dirname(__file__), "cassettes")
+DASHBOARD_ID = "3a81edc6-40d2-435a-87a3-41ce352a523d"
+CLIENT_IDS = [1, 2]
+
+def automation(transport, host="kibana.test", port=5601):
+    return ElasticAutomation(host, port, host, port, "elastic", "secret", scheme="http", transport=transport,
+                             retries=0)
+
+def copy_one(client):
+    return client.copy_dashboard_between_spaces(DASHBOARD_ID, "default", "client_1_space",
+                                                DEFAULT_SOURCE_DATA_VIEW, "client_1_data_view")
+
+def test_copy_dashboard_between_spaces_budget():
+    transport = ReplayTransport(os.path.join(CASSETTES, "copy_dashboard.jsonl"))
+    with automation(transport) as client:
+        copy_one(client)
+
+    # Export, data view lookup, one _find of the target space, import
+    assert transport.requests_for("copy_dashboard_between_spaces") <= 4
+    assert transport.requests_for("export_dashboard_bundle") == 1
+    assert transport.requests_for("import_saved_objects") == 1
+
+def test_copy_dashboards_budget():
+    transport = ReplayTransport(os.path.join(CASSETTES, "copy_dashboards.jsonl"))
+    with automation(transport) as client:
+        result = client.copy_dashboards(None, CLIENT_IDS)
+
+    assert result["status"] == "success"
+    dashboards = len(result["results"]) // len(CLIENT_IDS)
+    # Requests sent from the worker pool still count toward the calling operations
+    assert transport.requests_for("copy_dashboards") == transport.requests_for("fan_out_dashboards")
+    # One export per dashboard, then per target: a data view lookup and, per
+    # dashboard, one _find and at most one import
+    assert transport.requests_for("copy_dashboards") <= dashboards + len(CLIENT_IDS) * (1 + 2 * dashboards)
+    assert transport.requests_for("export_dashboard_bundle") == dashboards
+
+def record():
+    from app.dashboardMigration import onboard_tenant
+    from benchmarks.fake_cluster import FakeCluster, SEED_DATA_VIEW
+
+    with FakeCluster(regenerate_ids=True) as cluster:
+        with automation(None, "127.0.0.1", cluster.port) as client:
+            for client_id in CLIENT_IDS:
+                onboard_tenant(client, client_id, SEED_DATA_VIEW["title"], f"Tenant {client_id}",
+                               ["create_index_alias", "create_space", "create_data_view"])
+
+        for name, scenario in (("copy_dashboard", copy_one),
+                               ("copy_dashboards", lambda client: client.copy_dashboards(None, CLIENT_IDS))):
+            transport = RecordingTransport(SessionTransport(("elastic", "secret")))
+            with automation(transport, "127.0.0.1", cluster.port) as client:
+                scenario(client)
+            transport.save(os.path.join(CASSETTES, f"{name}.jsonl"))
+
+if __name__ == "__main__":
+    record()